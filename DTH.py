@@ -1,76 +1,24 @@
 import sys
-import requests
-from bs4 import BeautifulSoup
-import re
 import os
+import collections
 from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QTableWidget, QTableWidgetItem, QVBoxLayout,
+    QApplication, QMainWindow, QTableView, QVBoxLayout,
     QWidget, QPushButton, QLineEdit, QLabel, QHBoxLayout, QMessageBox
 )
-from PyQt5.QtWidgets import QMenu
-from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QMenu, QDockWidget
 from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QFont
 from datetime import datetime
-import json
-import threading
-import queue
-
-# Configuration file
-CONFIG_FILE = "ip_config.json"
-
-# Function to load IPs and titles with min/max temperature and humidity from the configuration file
-def load_ips():
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "r") as f:
-            data = json.load(f)
-            return data.get("ips", [])
-    return []
-
-# Function to save IPs and titles to the configuration file
-def save_ips(self):
-    with open(CONFIG_FILE, "w") as f:
-        json.dump({"ips": self.ip_list}, f, indent=4)
-
-# Function to fetch temperature and humidity for a given IP
-def get_temperature_and_humidity(ip):
-    url = f"http://{ip}"  # Create the URL based on the IP address
-    try:
-        response = requests.get(url, timeout=5)
-
-        # Log the response content for debugging
-        print(f"Response from {ip}: {response.status_code} - {response.text[:200]}")  # Log first 200 characters
-
-        if response.status_code != 200:
-            print(f"Non-200 response for IP {ip}: {response.status_code}")
-            return None, None  # Return no data for non-200 responses
-
-        # Parse the response
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Scrape Temperature and Humidity
-        temperature_text = soup.find(string=re.compile("TEMPERATURE", re.IGNORECASE))
-        temperature = None
-        if temperature_text:
-            temp_match = re.search(r"[-+]?\d*\.\d+|\d+", temperature_text)
-            if temp_match:
-                temperature = temp_match.group()
-
-        humidity_text = soup.find(string=re.compile("HUMIDITY", re.IGNORECASE))
-        humidity = None
-        if humidity_text:
-            humidity_match = re.search(r"[-+]?\d*\.\d+|\d+", humidity_text)
-            if humidity_match:
-                humidity = humidity_match.group()
-
-        # Log parsed results
-        print(f"Parsed data for {ip} - Temperature: {temperature}, Humidity: {humidity}")
-
-        return temperature, humidity
-    except requests.exceptions.RequestException as e:
-        print(f"Request exception for {ip}: {e}")
-        return None, None
+import time
+import logging
+from config_store import ConfigError, ConfigStore, apply_devices
+from table_model import ReadingTableModel, ID_COLUMN
+from device_registry import DeviceRegistry
+from health import HealthTracker, format_age
+from snapshot import SNAPSHOT_INTERVAL, load_snapshot, save_snapshot
 
+# The polling engine, history (numpy), alarms, metrics and live API modules are
+# imported in start_services(), after the window has been painted
 
 class TempHumidityMonitor(QMainWindow):
     def __init__(self):
@@ -78,20 +26,56 @@ class TempHumidityMonitor(QMainWindow):
         self.setWindowTitle("Temperature and Humidity Data")
         self.resize(900, 700)
 
-        # Load IP data
-        self.ip_list = load_ips() if load_ips() else []
-
-        # Data queue for threading
-        self.data_queue = queue.Queue()
-
-        # Table widget setup
-        self.table = QTableWidget()
-        self.table.setColumnCount(8)
-        self.table.setHorizontalHeaderLabels([
-            "","DHM No", "Barcode No","Location", "Temperature (°C)", "Humidity (%)", 
-            "Min/Max Temp (°C)", "Min/Max Humidity (%)"  # New columns
-        ])
-        self.table.setRowCount(0)
+        # Load IP data into the indexed device registry (edits are journalled, see ConfigStore)
+        self.config_store = ConfigStore()
+        try:
+            config = self.config_store.load()
+        except (OSError, ConfigError) as e:
+            QMessageBox.critical(None, "Configuration error", f"Could not load the device list: {e}")
+            sys.exit(1)
+        self.registry = DeviceRegistry(config.get("ips", []), next_id=config.get("next_id"))
+
+        # Client mode, e.g. DTH_CONNECT=192.168.1.20:8765: follow another copy's live feed
+        # instead of polling the devices; the device list then comes from that copy
+        self.feed_address = os.environ.get("DTH_CONNECT")
+        self.feed = None
+        if self.feed_address:
+            self.registry = DeviceRegistry()
+        elif self.config_store.assigned_ids:
+            try:
+                self.save_ips()  # Keep the ids given to hand-added devices
+            except OSError as e:
+                logging.getLogger("dth").warning("Could not save %s: %s", self.config_store.path, e)
+
+        # Per-device circuit breaker so offline units back off instead of eating timeouts
+        self.health = HealthTracker()
+
+        # Set up in start_services() once the window is on screen
+        self.mailbox = None
+        self.history = None
+        self.alarms = None
+        self.repeat_filter = None
+        self.engine = None
+        self.metrics_server = None
+        self.live = None
+        self.api_server = None
+
+        # Time of the reading each row shows, saved with the snapshot
+        self.reading_times = {}
+
+        # Registry whose devices the table was last checked against (client mode)
+        self.shown_registry = self.registry
+
+        # Trend window, created the first time it is opened from the context menu, and the
+        # readings waiting for it (every poll, including the repeats the table skips)
+        self.trend_window = None
+        self.trend_points = collections.deque()
+
+        # Table view setup, backed by a model that applies readings in batches
+        self.table_model = ReadingTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.table_model)
+        self.table.hideColumn(ID_COLUMN)
 
         # Enable context menu
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
@@ -103,7 +87,7 @@ class TempHumidityMonitor(QMainWindow):
         self.table.horizontalHeader().setDefaultSectionSize(200)  # Default column width: 200px
         self.table.setFont(QFont("Arial", 14, QFont.Bold))  # Set bold font with a larger size
         self.table.setStyleSheet("""
-    QTableWidget {
+    QTableView {
         background-color: #f9f9f9;
         alternate-background-color: #f0f0f0;
         gridline-color: #dcdcdc;
@@ -116,10 +100,10 @@ class TempHumidityMonitor(QMainWindow):
         padding: 4px;
         border: none;
     }
-    QTableWidget::item {
+    QTableView::item {
         padding: 4px;
     }
-    QTableWidget::item:selected {
+    QTableView::item:selected {
         background-color: #cde4f5;
         color: #000000;
     }
@@ -127,7 +111,7 @@ class TempHumidityMonitor(QMainWindow):
 
 
         self.table.setAlternatingRowColors(True)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)  # Prevent editing
+        self.table.setEditTriggers(QTableView.NoEditTriggers)  # Prevent editing
         self.table.horizontalHeader().setStretchLastSection(True)  # Stretch last column
         self.table.horizontalHeader().setHighlightSections(False)
         self.table.verticalHeader().setVisible(False)
@@ -135,6 +119,7 @@ class TempHumidityMonitor(QMainWindow):
       
         self.table.horizontalHeader().setDefaultSectionSize(180)  # Default width for other columns
         self.table.horizontalHeader().setSectionResizeMode(1, self.table.horizontalHeader().ResizeToContents)
+        self.table.setColumnWidth(6, 250)
         
         # Optional: Adjust font size and alignment for the table headers
         self.table.horizontalHeader().setFont(QFont("Arial", 13, QFont.Bold))
@@ -163,6 +148,8 @@ class TempHumidityMonitor(QMainWindow):
 
         self.add_ip_button = QPushButton("Add IP")
         self.add_ip_button.clicked.connect(self.add_ip)
+        self.discover_button = QPushButton("Discover...")
+        self.discover_button.clicked.connect(self.open_discovery)
 
         # Layout for adding IPs
         input_layout = QHBoxLayout()
@@ -184,6 +171,7 @@ class TempHumidityMonitor(QMainWindow):
         input_layout.addWidget(QLabel("Max Humidity:"))
         input_layout.addWidget(self.max_humidity_input)
         input_layout.addWidget(self.add_ip_button)
+        input_layout.addWidget(self.discover_button)
 
         # Header layout
         header_layout = QVBoxLayout()
@@ -244,13 +232,120 @@ class TempHumidityMonitor(QMainWindow):
         central_widget.setLayout(main_layout)
         self.setCentralWidget(central_widget)
 
+        # Stats panel (hidden until toggled from the table's context menu)
+        self.stats_label = QLabel()
+        self.stats_label.setFont(QFont("Arial", 11))
+        self.stats_label.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        self.stats_dock = QDockWidget("Statistics", self)
+        self.stats_dock.setWidget(self.stats_label)
+        self.addDockWidget(Qt.RightDockWidgetArea, self.stats_dock)
+        self.stats_dock.hide()
+
+        # Fill the table with the last run's readings (greyed out) so every row shows at once
+        self.restore_snapshot()
+
+        # Polling and everything heavy starts once the window has been painted (see paintEvent)
+        self.services_started = False
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.services_started:
+            self.services_started = True
+            QTimer.singleShot(0, self.start_services)
+
+    def start_services(self):
+        """Import the heavy modules and start polling, history, alarms and the optional servers."""
+        from history import HistoryStore
+        from alarms import AlarmEngine
+        from live_api import LiveState, LiveApiServer
+        from reading_mailbox import LatestValueMailbox, RepeatFilter
+        import metrics
+
+        # Latest reading per device, handed from the poll workers to the GUI in one batch
+        self.mailbox = LatestValueMailbox()
+
+        # On-disk reading history (one memory-mapped ring per device)
+        self.history = HistoryStore()
+
+        # Batch alarm checks (hysteresis, debounce, rate of change); tunable under "alarms" in the config
+        self.alarms = AlarmEngine(**self.config_store.extra.get("alarms", {}))
+
+        # Readings that repeat the last values are dropped before the queue once the alarm
+        # debounce window has seen them (history and health are still recorded by the engine)
+        self.repeat_filter = RepeatFilter(repeats=self.alarms.window)
+
+        # Optional Prometheus endpoint, e.g. DTH_METRICS_PORT=9108
+        if os.environ.get("DTH_METRICS_PORT"):
+            self.metrics_server = metrics.MetricsServer(int(os.environ["DTH_METRICS_PORT"])).start()
+
+        # Optional live API so other copies can watch this one, e.g. DTH_API_PORT=8765
+        # (DTH_API_HOST=0.0.0.0 to accept other PCs)
+        if os.environ.get("DTH_API_PORT") and not self.feed_address:
+            self.live = LiveState(self.registry)
+            self.api_server = LiveApiServer(
+                self.live, int(os.environ["DTH_API_PORT"]), host=os.environ.get("DTH_API_HOST", "127.0.0.1")
+            ).start()
+
         # Start background data updater
         self.start_background_worker()
         self.update_timer = QTimer()
         self.update_timer.timeout.connect(self.process_queue)
         self.update_timer.start(500)
 
-        self.ip_data_rows = {}
+        # Refresh device state and last-success age once a second
+        self.health_timer = QTimer()
+        self.health_timer.timeout.connect(self.update_health)
+        self.health_timer.start(1000)
+
+        # Pick up edits made to ip_config.json by other programs, and fold the journal in
+        self.config_timer = QTimer()
+        self.config_timer.timeout.connect(self.check_config)
+        self.config_timer.start(2000)
+
+        # Keep the warm-start snapshot current in case the app does not exit cleanly
+        if not self.feed_address:
+            self.snapshot_timer = QTimer()
+            self.snapshot_timer.timeout.connect(self.save_snapshot)
+            self.snapshot_timer.start(SNAPSHOT_INTERVAL * 1000)
+
+    def restore_snapshot(self):
+        """Show a row for every device at once: the last run's readings marked stale, in the last
+        run's row order, then any device without a saved reading as N/A."""
+        saved = {}
+        stale_since = {}
+        for device_id, ip, temperature, humidity, ts in load_snapshot():
+            ip_data = self.registry.get(device_id)
+            if ip_data is not None and ip_data['ip'] == ip:
+                saved[device_id] = (temperature, humidity)
+                stale_since[device_id] = ts
+        devices = {ip_data['id']: ip_data for ip_data in self.registry.snapshot()}
+        readings = []
+        for device_id in list(saved) + [device_id for device_id in devices if device_id not in saved]:
+            ip_data = devices[device_id]
+            temperature, humidity = saved.get(device_id, (None, None))
+            readings.append((
+                device_id, ip_data['ip'], ip_data.get('title', f"Data for IP: {ip_data['ip']}"),
+                ip_data.get('barcode', "Unknown"), ip_data.get('location', "Unknown"), temperature, humidity,
+                ip_data.get('min_temp', None), ip_data.get('max_temp', None),
+                ip_data.get('min_humidity', None), ip_data.get('max_humidity', None), False, False
+            ))
+        if readings:
+            self.table_model.apply_batch(readings, stale_since)
+            self.table.resizeColumnToContents(3)
+            self.update_health()
+
+    def save_snapshot(self):
+        """Save the table's current readings for the next start."""
+        # A repeated value skips the table, so the last good poll can be newer than the reading shown
+        times = dict(self.reading_times)
+        for device_id, ts in self.reading_times.items():
+            last_success = self.health.status(device_id)[1]
+            if last_success is not None and last_success > ts:
+                times[device_id] = last_success
+        try:
+            save_snapshot(self.table_model.snapshot_rows(times))
+        except OSError as e:
+            logging.getLogger("dth").warning("Could not save the reading snapshot: %s", e)
 
     def update_clock(self):
         """Update the clock display with the current date and time."""
@@ -258,20 +353,46 @@ class TempHumidityMonitor(QMainWindow):
         self.clock_label.setText(f"{current_time}")
 
    
-    def create_centered_item(self, text):
-        """Helper to create a centered table item."""
-        item = QTableWidgetItem(text)
-        item.setTextAlignment(Qt.AlignCenter)
-        return item
 
 
-    def save_ips(self):  # Move the save_ips function inside the class
-     with open(CONFIG_FILE, "w") as f:
-        json.dump({"ips": self.ip_list}, f, indent=4)
+    def save_ips(self):
+        """Write the whole device list to ip_config.json atomically."""
+        self.config_store.compact(self.registry.to_list(), self.registry.next_id)
+
+    def check_config(self):
+        """Apply outside edits of the configuration file live; compact the journal when idle."""
+        if self.feed_address:
+            return
+        if self.config_store.changed():
+            try:
+                config = self.config_store.load()
+            except (OSError, ConfigError) as e:
+                logging.getLogger("dth").warning("Could not reload the device list: %s", e)
+                return
+            old_ips = {ip_data['id']: ip_data['ip'] for ip_data in self.registry.snapshot()}
+            added, removed, updated = apply_devices(self.registry, config.get("ips", []))
+            for device_id in removed:
+                self.forget_device(device_id)
+            # Rows are keyed by IP, so a device moved to a new address starts a fresh row
+            for device_id in updated:
+                if self.registry.get(device_id)['ip'] != old_ips[device_id]:
+                    self.forget_device(device_id)
+            if added or removed or updated:
+                self.engine.refresh()
+            if self.config_store.assigned_ids:
+                self.save_ips()  # Keep the ids given to hand-added devices
+        elif self.config_store.needs_compaction():
+            try:
+                self.save_ips()
+            except OSError as e:
+                logging.getLogger("dth").warning("Could not save %s: %s", self.config_store.path, e)
 
 
     
     def add_ip(self):
+        if self.feed_address:
+            QMessageBox.information(self, "Viewer", f"Devices are managed on the monitor at {self.feed_address}.")
+            return
         ip = self.ip_input.text().strip()
         title = self.title_input.text().strip()
         barcode = self.barcode_input.text().strip()  # Capture the barcode
@@ -282,19 +403,25 @@ class TempHumidityMonitor(QMainWindow):
         max_humidity = float(self.max_humidity_input.text()) if self.max_humidity_input.text() else None
 
         if ip and title and location:  # Ensure location is also provided
-            new_id = len(self.ip_list) + 1
-            self.ip_list.append({
-                'id': new_id, 
-                'ip': ip,
-                'title': title,
-                'barcode': barcode,  # Add the barcode to the data
-                'location': location,  # Store the location
-                'min_temp': min_temp,
-                'max_temp': max_temp,
-                'min_humidity': min_humidity,
-                'max_humidity': max_humidity
-            })
-            self.save_ips()  # Save the IP data to the file
+            try:
+                device = self.registry.add({
+                    'ip': ip,
+                    'title': title,
+                    'barcode': barcode,  # Add the barcode to the data
+                    'location': location,  # Store the location
+                    'min_temp': min_temp,
+                    'max_temp': max_temp,
+                    'min_humidity': min_humidity,
+                    'max_humidity': max_humidity
+                })
+            except ValueError as e:
+                QMessageBox.warning(self, "Warning", str(e))
+                return
+            try:
+                self.config_store.record_add(device, self.registry.next_id)  # Save the IP data to the file
+            except OSError as e:
+                QMessageBox.warning(self, "Error", f"Failed to update the configuration file: {str(e)}")
+            self.engine.refresh()
             QMessageBox.information(self, "Success", f"IP address {ip} added successfully!")
             self.ip_input.clear()
             self.title_input.clear()
@@ -307,191 +434,267 @@ class TempHumidityMonitor(QMainWindow):
         else:
             QMessageBox.warning(self, "Warning", "Please enter IP, title, and location.")
 
+    def closeEvent(self, event):
+        """Flush the history rings, the configuration journal and the reading snapshot before the window closes."""
+        if self.history is not None:
+            self.history.flush()
+        if not self.feed_address:
+            self.save_snapshot()
+        if not self.feed_address and self.config_store.pending_edits:
+            self.save_ips()
+        super().closeEvent(event)
+
+    def open_discovery(self):
+        """Scan the network for hygrometers and register the ones picked."""
+        if self.feed_address:
+            QMessageBox.information(self, "Viewer", f"Devices are managed on the monitor at {self.feed_address}.")
+            return
+        from discovery_dialog import DiscoveryDialog
+        ranges = self.config_store.extra.get("discovery_ranges")
+        dialog = DiscoveryDialog(
+            [ip_data['ip'] for ip_data in self.registry.snapshot()], self.register_devices, parent=self,
+            **({"ranges": ranges} if ranges else {})
+        )
+        dialog.exec_()
+
+    def open_export(self):
+        """Export recorded history to CSV or Parquet without blocking polling or the GUI."""
+        if self.feed_address:
+            QMessageBox.information(self, "Viewer", f"History is recorded on the monitor at {self.feed_address}.")
+            return
+        from export_dialog import ExportDialog
+        dialog = ExportDialog(self.history, self.registry.snapshot(), parent=self)
+        dialog.exec_()
+
+    def open_trend(self):
+        """Open the trend window with the selected rows added to it."""
+        if self.feed_address:
+            QMessageBox.information(self, "Viewer", f"History is recorded on the monitor at {self.feed_address}.")
+            return
+        rows = {index.row() for index in self.table.selectionModel().selectedIndexes()}
+        if not rows and self.table.currentIndex().row() >= 0:
+            rows = {self.table.currentIndex().row()}
+        if not rows:
+            QMessageBox.warning(self, "Warning", "Please select a row to show.")
+            return
+        if self.trend_window is None:
+            from trend_view import TrendWindow
+            self.trend_window = TrendWindow(self.history, parent=self)
+        for row in sorted(rows):
+            ip_data = self.registry.get(self.table_model.device_id(row))
+            if ip_data is not None:
+                self.trend_window.add_device(ip_data)
+        self.trend_window.show()
+        self.trend_window.raise_()
+
+    def register_devices(self, devices):
+        """Add several devices at once; returns how many were added."""
+        added = 0
+        for fields in devices:
+            try:
+                device = self.registry.add(fields)
+            except ValueError as e:
+                logging.getLogger("dth").warning("Not registering %s: %s", fields['ip'], e)
+                continue
+            try:
+                self.config_store.record_add(device, self.registry.next_id)
+            except OSError as e:
+                QMessageBox.warning(self, "Error", f"Failed to update the configuration file: {str(e)}")
+            added += 1
+        if added:
+            self.engine.refresh()
+        return added
+
     def restart_app(self):
         """Restart the application programmatically."""
         python = sys.executable
         os.execl(python, python, *sys.argv)
 
     def start_background_worker(self):
-        
-        def worker():
-            while True:
-                for ip_data in self.ip_list:
-                    id =  ip_data['id']
-                    title = ip_data.get('title', f"Data for IP: {ip_data['ip']}")
-                    ip = ip_data['ip']
-                    barcode = ip_data.get('barcode', None)
-                    min_temp = ip_data.get('min_temp', None)
-                    max_temp = ip_data.get('max_temp', None)
-                    min_humidity = ip_data.get('min_humidity', None)
-                    max_humidity = ip_data.get('max_humidity', None)
-                    temperature, humidity = get_temperature_and_humidity(ip)
-                    
-
-                    # Add the data to the queue for the main thread to process
-                    self.data_queue.put((id, ip, title, temperature, humidity, min_temp, max_temp, min_humidity, max_humidity))
-
-        threading.Thread(target=worker, daemon=True).start()
-
-    def process_queue(self):
-        while not self.data_queue.empty():
-            id, ip, title, temperature, humidity, min_temp, max_temp, min_humidity, max_humidity = self.data_queue.get()
-
-            # Skip if IP is no longer valid
-            if ip not in [item['ip'] for item in self.ip_list]:
-                continue
-
-            # Get location or mark as Unknown
-            barcode = next((item['barcode'] for item in self.ip_list if item['ip'] == ip), "Unknown")
-            location = next((item['location'] for item in self.ip_list if item['ip'] == ip), "Unknown")
-
-            if ip in self.ip_data_rows:
-                # Update the existing row
-                row = self.ip_data_rows[ip]
-            else:
-                # Insert a new row
-                row = self.table.rowCount()
-                self.table.insertRow(row)
-                self.ip_data_rows[ip] = row
-
-            # Update row data
-            self.table.setItem(row, 0, QTableWidgetItem(str(id)))
-            self.table.hideColumn(0)
-            self.table.setItem(row, 1, QTableWidgetItem(title))
-            self.table.setItem(row, 2, QTableWidgetItem(barcode))
-            self.table.setItem(row, 3, QTableWidgetItem(location))
-            self.table.setColumnWidth(6, 250)
-            # Stretch the last column to fill the remaining width
-            self.table.horizontalHeader().setStretchLastSection(True)
-
-            temp_item = QTableWidgetItem(f"{temperature} °C" if temperature else "N/A")
-            humidity_item = QTableWidgetItem(f"{humidity} %" if humidity else "N/A")
-            min_max_temp_item = QTableWidgetItem(
-                f"{min_temp if min_temp else 'N/A'} / {max_temp if max_temp else 'N/A'}"
-            )
-            min_max_humidity_item = QTableWidgetItem(
-                f"{min_humidity if min_humidity else 'N/A'} / {max_humidity if max_humidity else 'N/A'}"
+        """Poll every device concurrently, each on its own interval."""
+        from engine import PollingEngine
+        from live_api import LiveFeedClient
+
+        def on_reading(ip_data, temperature, humidity, ts):
+            title = ip_data.get('title', f"Data for IP: {ip_data['ip']}")
+            if self.live is not None:
+                self.live.publish(ip_data, temperature, humidity, ts, self.health.status(ip_data['id'])[0])
+
+            reading = (
+                ip_data['id'], ip_data['ip'], title, temperature, humidity,
+                ip_data.get('min_temp', None), ip_data.get('max_temp', None),
+                ip_data.get('min_humidity', None), ip_data.get('max_humidity', None),
             )
+            if self.trend_window is not None:
+                self.trend_points.append((ip_data['id'], temperature, humidity, ts))
 
-            # Color coding for temperature
-            if temperature:
-                temp_value = float(temperature)
-                if (min_temp is not None and temp_value < min_temp) or (max_temp is not None and temp_value > max_temp):
-                    temp_item.setBackground(QColor("red"))
-                    temp_item.setForeground(QColor("white"))
-                else:
-                    temp_item.setBackground(QColor("green"))
-                    temp_item.setForeground(QColor("white"))
-
-            # Color coding for humidity
-            if humidity:
-                humidity_value = float(humidity)
-                if (min_humidity is not None and humidity_value < min_humidity) or (max_humidity is not None and humidity_value > max_humidity):
-                    humidity_item.setBackground(QColor("red"))
-                    humidity_item.setForeground(QColor("white"))
-                else:
-                    humidity_item.setBackground(QColor("green"))
-                    humidity_item.setForeground(QColor("white"))
-
-            # Add data to table
-            self.table.setItem(row, 4, temp_item)
-            self.table.setItem(row, 5, humidity_item)
-            self.table.setItem(row, 6, min_max_temp_item)
-            self.table.setItem(row, 7, min_max_humidity_item)
-
-            self.table.resizeColumnToContents(3)
-
-
-    def delete_row_by_id(self):
-        row = self.table.currentRow()
-        if row >= 0:
-            row_id = self.table.item(row, 0).text().strip()
-            ip_to_delete = next((item['ip'] for item in self.ip_list if str(item['id']) == row_id), None)
-
-            if ip_to_delete is None:
-                QMessageBox.warning(self, "Error", "Could not find the IP to delete.")
+            # Same values (and displayed fields) as the last few readings: skip the queue and the table update
+            shown = reading + (ip_data.get('barcode', "Unknown"), ip_data.get('location', "Unknown"))
+            if not self.repeat_filter.changed(ip_data['id'], shown):
                 return
 
-            # Remove the row from the table
-            self.table.removeRow(row)
-
-            # Remove the IP entry from self.ip_list
-            self.ip_list = [item for item in self.ip_list if str(item['id']) != row_id]
-
-            # Save the updated list to the JSON file
-            try:
-                with open(CONFIG_FILE, "w") as json_file:
-                    json.dump({"ips": self.ip_list}, json_file, indent=4)
-                QMessageBox.information(self, "Deleted", f"IP address with ID {row_id} has been deleted.")
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"Failed to update JSON file: {str(e)}")
+            # Hand the reading to the main thread; a newer one replaces it if still pending
+            self.mailbox.put(ip_data['id'], reading + (ts, time.monotonic()))
+
+        if self.feed_address:
+            def on_remote_reading(reading):
+                ip_data = self.registry.get(reading['id'])
+                if ip_data is None:
+                    return
+                temperature, humidity = reading['temperature'], reading['humidity']
+                self.health.record(ip_data['id'], temperature is not None or humidity is not None)
+                on_reading(ip_data, temperature, humidity, reading['ts'])
+
+            self.feed = LiveFeedClient(self.feed_address, on_remote_reading, on_devices=self.set_remote_devices)
+            self.feed.start()
+            return
+
+        # Large fleets can be polled from several processes, e.g. DTH_SHARDS=4 (or auto, one per core),
+        # grouped by DTH_SHARD_BY=subnet (default) or location
+        if os.environ.get("DTH_SHARDS"):
+            from sharding import ShardedPollingEngine
+            self.engine = ShardedPollingEngine(
+                self.registry, on_reading, history=self.history, health=self.health,
+                shards=os.environ["DTH_SHARDS"], shard_by=os.environ.get("DTH_SHARD_BY", "subnet"),
+            )
+        else:
+            self.engine = PollingEngine(self.registry, on_reading, history=self.history, health=self.health)
+        self.engine.start()
+
+    def set_remote_devices(self, devices):
+        """Replace the device list with the one served by the copy we follow.
+
+        Runs on the feed thread; process_queue() drops the rows of removed devices.
+        """
+        self.registry = DeviceRegistry(devices)
+
+    def drop_removed_devices(self):
+        """Forget table rows whose device is no longer in the followed copy's list."""
+        registry = self.registry
+        if registry is self.shown_registry:
+            return
+        self.shown_registry = registry
+        for row in reversed(range(self.table_model.rowCount())):
+            device_id = self.table_model.device_id(row)
+            if device_id not in registry:
+                self.forget_device(device_id)
+
+    def forget_device(self, device_id):
+        """Remove a device's row and everything kept about it (deleted, or moved to another IP)."""
+        row = self.table_model.row_for_id(device_id)
+        if row is not None:
+            self.table_model.remove_row(row)
+        self.health.forget(device_id)
+        self.mailbox.discard(device_id)
+        self.repeat_filter.forget(device_id)
+        self.reading_times.pop(device_id, None)
 
-            # Rebuild ip_data_rows to match current table state
-            self.ip_data_rows = {
-                self.table.item(row_idx, 1).text(): row_idx  # Rebuild using visible rows
-                for row_idx in range(self.table.rowCount())
-            }
+    def process_queue(self):
+        """Take the latest reading of every device and apply them to the table in one batch."""
+        import metrics
+        if self.feed_address:
+            self.drop_removed_devices()
+        if self.trend_points:
+            points = []
+            while self.trend_points:
+                points.append(self.trend_points.popleft())
+            self.trend_window.add_readings(points)
+        batch = self.mailbox.take_all()
+        metrics.QUEUE_DEPTH.set(len(batch))
+        if not batch:
+            return
+
+        start = time.monotonic()
+        fresh = []
+        for reading in batch:
+            metrics.QUEUE_WAIT_SECONDS.observe(start - reading[-1])
+            # Skip if the device was deleted (or its IP changed) while the reading was queued
+            ip_data = self.registry.get(reading[0])
+            if ip_data is not None and ip_data['ip'] == reading[1]:
+                fresh.append((reading, ip_data))
+                self.reading_times[reading[0]] = reading[9]
+
+        # Check the whole batch against the alarm limits in one go
+        self.alarms.sync(self.registry.snapshot())
+        for event in self.alarms.evaluate(
+            [reading[0] for reading, _ in fresh], [reading[3] for reading, _ in fresh],
+            [reading[4] for reading, _ in fresh], [reading[9] for reading, _ in fresh],
+        ):
+            logging.getLogger("dth").warning(
+                "Alarm %s: device %s %s %s (%s)", "raised" if event.active else "cleared",
+                event.device_id, event.channel, event.kind, event.value,
+            )
 
-            # Remove stale data from the queue
-            temp_queue = queue.Queue()
-            while not self.data_queue.empty():
-                data = self.data_queue.get()
-                if data[1] != ip_to_delete:  # Skip entries for the deleted IP
-                    temp_queue.put(data)
-            self.data_queue = temp_queue
+        readings = []
+        for reading, ip_data in fresh:
+            id, ip, title, temperature, humidity, min_temp, max_temp, min_humidity, max_humidity = reading[:9]
+            readings.append((
+                id, ip, title, ip_data.get('barcode', "Unknown"), ip_data.get('location', "Unknown"),
+                temperature, humidity, min_temp, max_temp, min_humidity, max_humidity,
+                self.alarms.is_active(id, "temperature"), self.alarms.is_active(id, "humidity")
+            ))
 
-        else:
-            QMessageBox.warning(self, "Warning", "Please select a row to delete.")
+        if self.table_model.apply_batch(readings):
+            self.table.resizeColumnToContents(3)
+        metrics.APPLY_SECONDS.observe(time.monotonic() - start)
 
 
+    def update_health(self):
+        """Show each device's circuit state and time since its last good reading."""
+        statuses = {}
+        for ip_data in self.registry.snapshot():
+            stale_since = self.table_model.stale_since(ip_data['id'])
+            if stale_since is not None:
+                # Still showing the snapshot value; its age is how old that reading is
+                statuses[ip_data['id']] = ("stale", format_age(stale_since))
+                continue
+            state, last_success = self.health.status(ip_data['id'])
+            statuses[ip_data['id']] = (state, format_age(last_success))
+        self.table_model.set_health(statuses)
+        if self.stats_dock.isVisible():
+            import metrics
+            self.stats_label.setText(metrics.summary())
 
     def show_context_menu(self, pos):
  
         context_menu = QMenu(self)
         delete_action = context_menu.addAction("Delete")
         delete_action.triggered.connect(self.delete_row_by_id)
+        trend_action = context_menu.addAction("Show Trend")
+        trend_action.triggered.connect(self.open_trend)
+        export_action = context_menu.addAction("Export History...")
+        export_action.triggered.connect(self.open_export)
+        stats_action = context_menu.addAction("Show Statistics")
+        stats_action.setCheckable(True)
+        stats_action.setChecked(self.stats_dock.isVisible())
+        stats_action.toggled.connect(self.stats_dock.setVisible)
         context_menu.exec_(self.table.mapToGlobal(pos))
 
 
     def delete_row_by_id(self):
-        row = self.table.currentRow()
+        if self.feed_address:
+            QMessageBox.information(self, "Viewer", f"Devices are managed on the monitor at {self.feed_address}.")
+            return
+        row = self.table.currentIndex().row()
         if row >= 0:
-            row_id = self.table.item(row, 0).text().strip()
-            ip_to_delete = next((item['ip'] for item in self.ip_list if str(item['id']) == row_id), None)
+            row_id = self.table_model.device_id(row)
+            deleted = self.registry.remove(row_id)
 
-            if ip_to_delete is None:
+            if deleted is None:
                 QMessageBox.warning(self, "Error", "Could not find the IP to delete.")
                 return
 
-            # Remove the row from the table
-            self.table.removeRow(row)
+            # Remove the row from the table (rows below it are renumbered in place)
+            self.forget_device(row_id)
+            self.engine.refresh()
 
-            # Remove the IP entry from self.ip_list
-            self.ip_list = [item for item in self.ip_list if str(item['id']) != row_id]
-
-            # Save the updated list to the JSON file
+            # Record the deletion in the configuration journal
             try:
-                with open(CONFIG_FILE, "w") as json_file:
-                    json.dump({"ips": self.ip_list}, json_file, indent=4)
+                self.config_store.record_remove(row_id)
                 QMessageBox.information(self, "Deleted", f"IP address with ID {row_id} has been deleted.")
             except Exception as e:
                 QMessageBox.warning(self, "Error", f"Failed to update JSON file: {str(e)}")
 
-            # Remove the IP from ip_data_rows and reassign row indices
-            self.ip_data_rows = {
-            ip: (idx if idx < row else idx - 1)
-            for ip, idx in self.ip_data_rows.items()
-            if ip != ip_to_delete
-        }
-
-            # Ensure no stale data in the queue
-            temp_queue = queue.Queue()
-            while not self.data_queue.empty():
-                data = self.data_queue.get()
-                if data[1] != ip_to_delete:  # Skip entries for the deleted IP
-                    temp_queue.put(data)
-            self.data_queue = temp_queue
-
         else:
             QMessageBox.warning(self, "Warning", "Please select a row to delete.")
 
@@ -500,6 +703,11 @@ class TempHumidityMonitor(QMainWindow):
     
             
 if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()  # Polling shards re-run the frozen exe (DTH_SHARDS)
+    # Per-response debug logging is off unless DTH_DEBUG is set
+    logging.basicConfig(level=logging.DEBUG if os.environ.get("DTH_DEBUG") else logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     app = QApplication(sys.argv)
     window = TempHumidityMonitor()
     window.show()
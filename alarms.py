@@ -0,0 +1,221 @@
+import json
+import threading
+import time
+from datetime import datetime
+import numpy as np
+
+# Audit log of every alarm raise/clear, one JSON object per line
+ALARM_LOG_FILE = "alarm_audit.log"
+
+CHANNELS = ("temperature", "humidity")
+LIMIT_KEYS = {"temperature": ("min_temp", "max_temp"), "humidity": ("min_humidity", "max_humidity")}
+
+# Defaults: how far back inside the limits a value must come before an alarm
+# clears, N-of-M debounce, and rate-of-change limits per minute (NaN = off)
+DEFAULT_HYSTERESIS = {"temperature": 0.5, "humidity": 1.0}
+DEFAULT_DEBOUNCE = (2, 3)
+DEFAULT_MAX_RATE = {"temperature": np.nan, "humidity": np.nan}
+
+# Popcount of the 8-bit debounce windows
+_POPCOUNT = np.array([bin(n).count("1") for n in range(256)], dtype=np.uint8)
+
+
+class AlarmEvent:
+    """One alarm transition for one device channel."""
+
+    def __init__(self, ts, device_id, channel, kind, active, value, low, high):
+        self.ts = ts
+        self.device_id = device_id
+        self.channel = channel
+        self.kind = kind  # "limit" or "rate"
+        self.active = active
+        self.value = value
+        self.low = low
+        self.high = high
+
+    def to_dict(self):
+        return {
+            "time": datetime.fromtimestamp(self.ts).isoformat(timespec="seconds"),
+            "device_id": self.device_id,
+            "channel": self.channel,
+            "kind": self.kind,
+            "event": "raised" if self.active else "cleared",
+            "value": None if self.value != self.value else round(float(self.value), 3),
+            "low": self.low,
+            "high": self.high,
+        }
+
+
+class _Rule:
+    """Vectorized state for one channel and one kind of check across all devices."""
+
+    def __init__(self, size):
+        self.active = np.zeros(size, dtype=bool)
+        self.window = np.zeros(size, dtype=np.uint8)  # Last M raw results, newest in bit 0
+
+    def grow(self, size):
+        extra = size - len(self.active)
+        self.active = np.concatenate([self.active, np.zeros(extra, dtype=bool)])
+        self.window = np.concatenate([self.window, np.zeros(extra, dtype=np.uint8)])
+
+    def step(self, slots, candidate, need, mask):
+        """Push one result per slot and return the slots whose state flipped."""
+        window = ((self.window[slots] << 1) | candidate.astype(np.uint8)) & mask
+        self.window[slots] = window
+        hits = _POPCOUNT[window]
+        active = self.active[slots]
+        # Raise after N of the last M readings were bad, clear after N of M were good
+        flip = np.where(active, (_POPCOUNT[mask] - hits) >= need, hits >= need)
+        self.active[slots] = active ^ flip
+        # Start a flipped slot's window over so readings from before the flip don't
+        # count towards flipping it back: all "bad" after a raise, all "good" after a clear
+        flipped = slots[flip]
+        self.window[flipped] = np.where(active[flip], 0, mask).astype(np.uint8)
+        return flip
+
+
+class AlarmEngine:
+    """Batch alarm evaluation with hysteresis, N-of-M debounce and rate-of-change rules.
+
+    Per-device limits live in NumPy arrays indexed by a slot per device, so a
+    drained batch of readings is checked with a handful of array operations.
+    Only transitions are reported (and appended to the audit log); callers
+    read the current state with is_active().
+    """
+
+    def __init__(self, hysteresis=None, debounce=DEFAULT_DEBOUNCE, max_rate=None, log_path=ALARM_LOG_FILE):
+        need, window = debounce
+        if not 1 <= need <= window <= 8:
+            raise ValueError("debounce must be N-of-M with 1 <= N <= M <= 8")
+        self.need = need
+        self.window = window
+        self.mask = np.uint8((1 << window) - 1)
+        self.hysteresis = dict(DEFAULT_HYSTERESIS, **(hysteresis or {}))
+        self.max_rate = dict(DEFAULT_MAX_RATE, **(max_rate or {}))
+        self.log_path = log_path
+
+        self._lock = threading.Lock()
+        self._slots = {}
+        self._ids = []
+        self._size = 0
+        self._low = {channel: np.empty(0) for channel in CHANNELS}
+        self._high = {channel: np.empty(0) for channel in CHANNELS}
+        self._last_value = {channel: np.empty(0) for channel in CHANNELS}
+        self._last_ts = np.empty(0)
+        self._rules = {(channel, kind): _Rule(0) for channel in CHANNELS for kind in ("limit", "rate")}
+        self._devices = None
+
+    def _grow(self, size):
+        extra = size - self._size
+        nan = np.full(extra, np.nan)
+        for channel in CHANNELS:
+            self._low[channel] = np.concatenate([self._low[channel], nan])
+            self._high[channel] = np.concatenate([self._high[channel], nan])
+            self._last_value[channel] = np.concatenate([self._last_value[channel], nan])
+        self._last_ts = np.concatenate([self._last_ts, nan])
+        for rule in self._rules.values():
+            rule.grow(size)
+        self._size = size
+
+    def sync(self, devices):
+        """Load limits from a device list (registry snapshot); cheap if unchanged."""
+        with self._lock:
+            if devices is self._devices:
+                return
+            self._devices = devices
+            new = [ip_data['id'] for ip_data in devices if ip_data['id'] not in self._slots]
+            if new:
+                self._grow(max(self._size * 2, self._size + len(new)))
+                for device_id in new:
+                    self._slots[device_id] = len(self._ids)
+                    self._ids.append(device_id)
+            for ip_data in devices:
+                slot = self._slots[ip_data['id']]
+                for channel in CHANNELS:
+                    low_key, high_key = LIMIT_KEYS[channel]
+                    low, high = ip_data.get(low_key), ip_data.get(high_key)
+                    self._low[channel][slot] = np.nan if low is None else low
+                    self._high[channel][slot] = np.nan if high is None else high
+
+    def is_active(self, device_id, channel):
+        """True if the limit or rate alarm of this channel is currently raised."""
+        slot = self._slots.get(device_id)
+        if slot is None:
+            return False
+        return bool(self._rules[(channel, "limit")].active[slot] or self._rules[(channel, "rate")].active[slot])
+
+    def evaluate(self, device_ids, temperatures, humidities, timestamps=None):
+        """Check one batch of readings; returns the list of AlarmEvents it caused.
+
+        Values may be None (no reading) and are skipped for that channel.
+        Devices not passed to sync() yet are ignored.
+        """
+        with self._lock:
+            known = [i for i, device_id in enumerate(device_ids) if device_id in self._slots]
+            if not known:
+                return []
+            slots = np.fromiter((self._slots[device_ids[i]] for i in known), dtype=np.intp, count=len(known))
+            now = time.time()
+            ts = np.fromiter(
+                (now if timestamps is None else timestamps[i] for i in known), dtype=float, count=len(known)
+            )
+            values = {
+                "temperature": np.array([np.nan if temperatures[i] is None else temperatures[i] for i in known]),
+                "humidity": np.array([np.nan if humidities[i] is None else humidities[i] for i in known]),
+            }
+
+            events = []
+            for channel in CHANNELS:
+                value = values[channel]
+                present = ~np.isnan(value)
+                if not present.any():
+                    continue
+                s, v, t = slots[present], value[present], ts[present]
+                low = np.where(np.isnan(self._low[channel][s]), -np.inf, self._low[channel][s])
+                high = np.where(np.isnan(self._high[channel][s]), np.inf, self._high[channel][s])
+
+                # Limit rule with hysteresis: raise outside the limits, clear only once
+                # the value is back inside them by the hysteresis band
+                band = self.hysteresis[channel]
+                rule = self._rules[(channel, "limit")]
+                outside = (v < low) | (v > high)
+                not_clear = (v < low + band) | (v > high - band)
+                candidate = np.where(rule.active[s], not_clear, outside)
+                events += self._events(rule.step(s, candidate, self.need, self.mask), s, v, t, channel, "limit",
+                                       rule)
+
+                # Rate-of-change rule, per minute, against the previous reading
+                max_rate = self.max_rate[channel]
+                if max_rate == max_rate:
+                    last_v, last_t = self._last_value[channel][s], self._last_ts[s]
+                    dt = t - last_t
+                    with np.errstate(invalid="ignore", divide="ignore"):
+                        rate = np.abs(v - last_v) / dt * 60.0
+                    candidate = (dt > 0) & (rate > max_rate)
+                    rule = self._rules[(channel, "rate")]
+                    events += self._events(rule.step(s, candidate, self.need, self.mask), s, v, t, channel, "rate",
+                                           rule)
+                self._last_value[channel][s] = v
+            self._last_ts[slots] = ts
+
+        if events:
+            self._audit(events)
+        return events
+
+    def _events(self, flipped, slots, values, timestamps, channel, kind, rule):
+        events = []
+        for i in np.flatnonzero(flipped):
+            slot = slots[i]
+            low, high = self._low[channel][slot], self._high[channel][slot]
+            events.append(AlarmEvent(
+                float(timestamps[i]), self._ids[slot], channel, kind, bool(rule.active[slot]), values[i],
+                None if np.isnan(low) else float(low), None if np.isnan(high) else float(high),
+            ))
+        return events
+
+    def _audit(self, events):
+        if not self.log_path:
+            return
+        with open(self.log_path, "a") as f:
+            for event in events:
+                f.write(json.dumps(event.to_dict()) + "\n")
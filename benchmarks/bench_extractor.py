@@ -0,0 +1,64 @@
+"""Compare per-reading CPU time and allocations of the reading parsers.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_extractor [--iterations N]
+"""
+import argparse
+import time
+import tracemalloc
+
+from extractor import ReadingExtractor, parse_with_soup, scan_bytes
+
+# Page in the same format the Arduino sketch serves
+SAMPLE_PAGE = (
+    b"<!DOCTYPE HTML>\r\n<html><head><meta http-equiv=\"refresh\" content=\"5\">"
+    b"<title>DHM</title></head><body>"
+    b"<h2>Digital Hygrometer</h2>"
+    b"<p>TEMPERATURE: 24.60 C</p>"
+    b"<p>HUMIDITY: 55.30 %</p>"
+    b"</body></html>\r\n"
+)
+
+
+def measure(name, func, iterations):
+    func()  # Warm up caches and lazy imports
+
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    cpu = (time.process_time() - start) / iterations
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    func()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+
+    print(f"{name:<24} {cpu * 1e6:10.1f} us/reading {peak:10d} B peak {blocks:6d} blocks")
+    return cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    extractor = ReadingExtractor()
+    extractor.extract(SAMPLE_PAGE, key="bench")  # Learn the page profile
+    profile = extractor.profile("bench")
+    assert scan_bytes(SAMPLE_PAGE) == parse_with_soup(SAMPLE_PAGE)
+
+    print(f"{'parser':<24} {'cpu':>18} {'alloc':>15} {'':>13}")
+    soup = measure("BeautifulSoup", lambda: parse_with_soup(SAMPLE_PAGE), args.iterations)
+    scan = measure("byte scan", lambda: scan_bytes(SAMPLE_PAGE), args.iterations)
+    profiled = measure("byte scan + profile", lambda: scan_bytes(SAMPLE_PAGE, profile), args.iterations)
+    measure("ReadingExtractor", lambda: extractor.extract(SAMPLE_PAGE, key="bench"), args.iterations)
+
+    print(f"speed-up vs BeautifulSoup: {soup / scan:.0f}x (scan), {soup / profiled:.0f}x (profile)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Load benchmark for the polling path against a simulated device farm.
+
+Starts device_farm in a child process (so its CPU is not counted), then for
+each fleet size measures one full sweep, sustained readings per second,
+p50/p99 fetch latency, poller CPU time and peak memory. Each size runs in
+a process of its own, so the memory peak of one size does not carry over
+into the next. Run from the repository root:
+
+    python -m benchmarks.bench_polling [--sizes 10 100 1000] [--duration 5]
+"""
+import argparse
+import concurrent.futures
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+from device_registry import DeviceRegistry
+from engine import PollingEngine
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def start_farm(count, base_port, args):
+    command = [
+        sys.executable, "-m", "device_farm", "--devices", str(count), "--base-port", str(base_port),
+        "--latency", str(args.latency[0]), str(args.latency[1]),
+        "--timeout-rate", str(args.timeout_rate), "--malformed-rate", str(args.malformed_rate),
+        "--reset-rate", str(args.reset_rate),
+    ]
+    farm = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = farm.stdout.readline()  # "Serving ..." once every port is listening
+    if not line or farm.poll() is not None:
+        # EOF: the farm exited before listening (e.g. a port already in use)
+        raise SystemExit(f"Device farm failed to start (exit code {farm.wait()})")
+    return farm
+
+
+def device_list(count, base_port):
+    return [
+        {"id": n + 1, "ip": f"127.0.0.1:{base_port + n}", "title": f"SIM/{n + 1:04d}",
+         "min_temp": 18.0, "max_temp": 28.0, "min_humidity": 30.0, "max_humidity": 70.0}
+        for n in range(count)
+    ]
+
+
+def run(count, base_port, args):
+    farm = start_farm(count, base_port, args)
+    latencies = []
+    lock = threading.Lock()
+    received = threading.Event()
+    seen = set()
+    readings = [0]
+
+    def on_reading(ip_data, temperature, humidity, ts):
+        with lock:
+            readings[0] += 1
+            seen.add(ip_data['id'])
+            if len(seen) == count:
+                received.set()
+
+    try:
+        # Sweep: every device polled once, as fast as the engine allows
+        poller = PollingEngine(DeviceRegistry(device_list(count, base_port)), on_reading,
+                               max_in_flight=args.max_in_flight, default_interval=3600, default_jitter=0)
+        fetch = poller.scheduler.fetch
+
+        def timed_fetch(ip_data):
+            start = time.perf_counter()
+            try:
+                return fetch(ip_data)
+            finally:
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+        poller.scheduler.fetch = timed_fetch
+        start = time.perf_counter()
+        poller.start()
+        received.wait(timeout=120)
+        sweep = time.perf_counter() - start
+        poller.stop(wait=True)  # No stray sweep fetch may land in the sustained counts
+
+        # Sustained: poll continuously for the configured duration
+        readings[0] = 0
+        latencies.clear()
+        poller = PollingEngine(DeviceRegistry(device_list(count, base_port)), on_reading,
+                               max_in_flight=args.max_in_flight, default_interval=args.interval, default_jitter=0)
+        fetch = poller.scheduler.fetch
+        poller.scheduler.fetch = timed_fetch
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        poller.start()
+        time.sleep(args.duration)
+        poller.stop(wait=True)
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+    finally:
+        farm.terminate()
+        farm.wait()
+
+    with lock:
+        rate = readings[0] / elapsed
+        p50, p99 = percentile(latencies, 0.50), percentile(latencies, 0.99)
+    return {
+        "devices": count,
+        "sweep_s": sweep,
+        "readings_per_s": rate,
+        "p50_ms": p50 * 1000,
+        "p99_ms": p99 * 1000,
+        "cpu_s": cpu,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--duration", type=float, default=5.0, help="sustained run length per size")
+    parser.add_argument("--interval", type=float, default=0.0, help="per-device poll interval in the sustained run")
+    parser.add_argument("--max-in-flight", type=int, default=32)
+    parser.add_argument("--base-port", type=int, default=18000)
+    parser.add_argument("--latency", type=float, nargs=2, default=(0.005, 0.02), metavar=("MIN", "MAX"))
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--reset-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    # Each device needs a socket on both sides
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, 4 * max(args.sizes) + 256)), hard))
+
+    print(f"{'devices':>8} {'sweep s':>9} {'readings/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'cpu s':>7} {'rss MB':>8}")
+    for count in args.sizes:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as pool:
+            result = pool.submit(run, count, args.base_port, args).result()
+        print(f"{result['devices']:>8} {result['sweep_s']:>9.2f} {result['readings_per_s']:>11.0f} "
+              f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['cpu_s']:>7.2f} {result['max_rss_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
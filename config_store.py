@@ -0,0 +1,238 @@
+import json
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger("dth")
+
+# Configuration file
+CONFIG_FILE = "ip_config.json"
+
+# Journal entries are folded into the main file after this many edits, or
+# once edits have been quiet for COMPACT_IDLE seconds
+COMPACT_AFTER = 50
+COMPACT_IDLE = 30.0
+
+
+class ConfigError(ValueError):
+    """The configuration file could not be read as a device list."""
+
+
+# Function to write a file so readers only ever see the old or the new contents
+def write_atomic(path, text):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+# Function to pick the valid device entries of an "ips" list; entries without an id get None
+def _valid_devices(entries, path):
+    devices = []
+    ids = set()
+    for entry in entries:
+        if not isinstance(entry, dict) or not isinstance(entry.get('ip'), str) or not entry['ip'].strip():
+            logger.warning("Ignoring an entry without an IP address in %s: %.100r", path, entry)
+            continue
+        device_id = entry.get('id')
+        if device_id is not None and (isinstance(device_id, bool) or not isinstance(device_id, int)
+                                      or device_id in ids):
+            logger.warning("Ignoring device %s in %s: its id %r is not a new whole number",
+                           entry['ip'], path, device_id)
+            continue
+        ids.add(device_id)
+        devices.append(entry)
+    return devices
+
+
+# Function to apply one journal entry to a {id: device} dict
+def _replay(devices, entry):
+    op = entry.get("op")
+    if op == "add":
+        device = entry["device"]
+        devices[device['id']] = device
+    elif op == "remove":
+        devices.pop(entry["id"], None)
+
+
+# Function to bring a registry in line with a device list; returns (added, removed, updated) ids
+def apply_devices(registry, devices):
+    wanted = {device['id']: device for device in devices}
+    current = {device['id']: device for device in registry.snapshot()}
+    removed = [device_id for device_id in current if device_id not in wanted]
+    for device_id in removed:
+        registry.remove(device_id)
+
+    updated = []
+    added = []
+    for device_id, device in wanted.items():
+        old = current.get(device_id)
+        if old is not None and dict(old) == device:
+            continue
+        try:
+            if old is None:
+                registry.add(device)
+                added.append(device_id)
+            else:
+                registry.update(device_id, **{key: value for key, value in device.items() if key != 'id'})
+                updated.append(device_id)
+        except ValueError as e:
+            logger.warning("Ignoring device %s from the configuration file: %s", device_id, e)
+    return added, removed, updated
+
+
+class ConfigStore:
+    """ip_config.json plus a small append-only journal of edits.
+
+    Each add or remove is appended to ``<path>.journal`` as one JSON line,
+    so a single edit costs one short write however many devices there are.
+    compact() folds the journal into the main file with an atomic
+    write-and-rename, so a crash never leaves a half-written device list.
+    changed() notices edits made to either file by another program.
+    """
+
+    def __init__(self, path=CONFIG_FILE, compact_after=COMPACT_AFTER, compact_idle=COMPACT_IDLE):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.compact_after = compact_after
+        self.compact_idle = compact_idle
+        self._extra = {}  # Other top-level keys (e.g. "alarms"), kept as they are
+        self._journal_entries = 0
+        self._last_append = 0.0
+        self._signature = None
+        self.assigned_ids = []  # Ids given to entries that had none at the last load(); worth saving
+
+    def _stat(self):
+        signature = []
+        for path in (self.path, self.journal_path):
+            try:
+                st = os.stat(path)
+                signature.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def load(self):
+        """The configuration with any journalled edits applied.
+
+        Entries added by hand may leave out the id; they get the next free
+        ones (listed in assigned_ids). Entries without an IP, with a reused
+        id or with an IP that is already listed are skipped with a warning.
+        Raises ConfigError if the file is not a device list at all.
+        """
+        config = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                try:
+                    config = json.load(f)
+                except ValueError as e:
+                    raise ConfigError(f"{self.path} is not valid JSON: {e}") from None
+        if not isinstance(config, dict) or not isinstance(config.get("ips", []), list):
+            raise ConfigError(f'{self.path} must hold an object with an "ips" list')
+        next_id = config.get("next_id")
+        next_id = next_id if isinstance(next_id, int) and not isinstance(next_id, bool) else 0
+        listed = _valid_devices(config.get("ips", []), self.path)
+        devices = {device['id']: device for device in listed if device.get('id') is not None}
+        unnumbered = [device for device in listed if device.get('id') is None]
+        entries = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "rb") as f:
+                data = f.read()
+            complete = 0  # Bytes of whole, readable entries
+            for line in data.splitlines(keepends=True):
+                try:
+                    entry = json.loads(line)
+                    _replay(devices, entry)
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    break  # Torn last line from a crash mid-append
+                next_id = max(next_id, entry.get("next_id") or 0)
+                entries += 1
+                complete += len(line)
+            if data and (complete < len(data) or not data.endswith(b"\n")):
+                self._repair_journal(data[:complete])
+
+        next_id = max([next_id, 1] + [device_id + 1 for device_id in devices])  # Ids start at 1
+        self.assigned_ids = []
+        for device in unnumbered:
+            devices[next_id] = dict(device, id=next_id)
+            self.assigned_ids.append(next_id)
+            next_id += 1
+        seen = set()
+        for device_id, device in list(devices.items()):
+            if device['ip'] in seen:
+                logger.warning("Ignoring device %s in %s: IP address %s is listed twice",
+                               device_id, self.path, device['ip'])
+                del devices[device_id]
+                if device_id in self.assigned_ids:
+                    self.assigned_ids.remove(device_id)
+            seen.add(device['ip'])
+        if self.assigned_ids:
+            logger.warning("Gave ids %s to new devices in %s", self.assigned_ids, self.path)
+        self._extra = {key: value for key, value in config.items() if key not in ("ips", "next_id")}
+        self._journal_entries = entries
+        self._signature = self._stat()
+        return dict(self._extra, ips=list(devices.values()), next_id=next_id or None)
+
+    def _repair_journal(self, complete):
+        # Cut a torn tail off the journal so the next append starts on a line of its own;
+        # otherwise every later entry would be glued to the broken line and lost on load
+        if complete and not complete.endswith(b"\n"):
+            complete += b"\n"
+        logger.warning("Repairing a torn entry at the end of %s", self.journal_path)
+        write_atomic(self.journal_path, complete.decode())
+
+    def changed(self):
+        """True if the files were modified by someone else since our last load or write."""
+        return self._stat() != self._signature
+
+    def _append(self, entry):
+        with open(self.journal_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_entries += 1
+        self._last_append = time.monotonic()
+        self._signature = self._stat()
+
+    def record_add(self, device, next_id):
+        self._append({"op": "add", "device": dict(device), "next_id": next_id})
+
+    def record_remove(self, device_id):
+        self._append({"op": "remove", "id": device_id})
+
+    @property
+    def extra(self):
+        """Top-level settings other than the device list (e.g. "alarms")."""
+        return dict(self._extra)
+
+    @property
+    def pending_edits(self):
+        """Edits in the journal that are not in the main file yet."""
+        return self._journal_entries
+
+    def needs_compaction(self):
+        if not self._journal_entries:
+            return False
+        return (self._journal_entries >= self.compact_after
+                or time.monotonic() - self._last_append >= self.compact_idle)
+
+    def compact(self, devices, next_id):
+        """Write the full device list atomically and empty the journal."""
+        write_atomic(self.path, json.dumps(dict(self._extra, ips=devices, next_id=next_id), indent=4))
+        # The journal only holds edits already in the new file, so replaying
+        # it after a crash right here would change nothing
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_entries = 0
+        self._signature = self._stat()
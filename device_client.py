@@ -0,0 +1,181 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.connectionpool import HTTPConnectionPool
+
+# Connection settings for the Arduino web servers
+DEFAULT_CONNECT_TIMEOUT = 2.0
+DEFAULT_READ_TIMEOUT = 5.0
+DEFAULT_MAX_BYTES = 64 * 1024
+DEFAULT_MAX_HOSTS = 256  # Per-host pools kept alive before the oldest is evicted (grown by reserve_hosts)
+
+
+class DeviceResponse:
+    """Status, headers and (capped) body of one device fetch."""
+
+    def __init__(self, status_code, headers, body, truncated=False):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.truncated = truncated
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+
+# Set by _CountingConnection.connect() so the adapter can tell, per thread,
+# whether the request it just sent had to open a new socket
+_attempt = threading.local()
+
+
+class _CountingConnection(HTTPConnection):
+    def connect(self):
+        _attempt.opened = True
+        super().connect()
+
+
+class _CountingPool(HTTPConnectionPool):
+    ConnectionCls = _CountingConnection
+
+
+class _CountingAdapter(HTTPAdapter):
+    """HTTPAdapter that records whether each request opened a new connection."""
+
+    def __init__(self, client, **kwargs):
+        self._client = client
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = dict(self.poolmanager.pool_classes_by_scheme, http=_CountingPool)
+
+    def send(self, request, **kwargs):
+        _attempt.opened = False
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            self._client._count("reused_connections" if self.last_reused else "new_connections")
+
+    @property
+    def last_reused(self):
+        return not getattr(_attempt, "opened", True)
+
+
+class DeviceClient:
+    """Shared keep-alive HTTP client for the hygrometers.
+
+    One small connection pool is kept per device so repeated polls reuse the
+    same TCP connection instead of opening a new one each time.
+    """
+
+    def __init__(self, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 max_bytes=DEFAULT_MAX_BYTES, max_hosts=DEFAULT_MAX_HOSTS):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_bytes = max_bytes
+        self.max_hosts = max_hosts
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "new_connections": 0,
+            "reused_connections": 0,
+            "stale_retries": 0,
+            "truncated": 0,
+            "errors": 0,
+        }
+
+        # The Arduino Ethernet stack only handles a few sockets, so keep one per host
+        self._adapter = _CountingAdapter(self, pool_connections=max_hosts, pool_maxsize=1, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("http://", self._adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+
+    def reserve_hosts(self, count):
+        """Keep a pool for at least `count` devices.
+
+        The pool manager evicts the least recently used host past its limit,
+        so polling more devices than that round-robin would never reuse a
+        connection. Pools already open are carried over to the larger manager.
+        """
+        with self._lock:
+            if count <= self.max_hosts:
+                return
+            self.max_hosts = count + count // 4  # Headroom so small additions don't resize again
+            old = self._adapter.poolmanager
+            self._adapter.init_poolmanager(self.max_hosts, 1)
+            for key in old.pools.keys():
+                pool = old.pools.get(key)
+                if pool is not None:
+                    self._adapter.poolmanager.pools[key] = pool
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def get(self, url, headers=None, timeout=None):
+        """Fetch url and return a DeviceResponse; raises requests exceptions.
+
+        timeout overrides the client's (connect, read) timeouts for this call.
+        """
+        self._count("requests")
+        timeout = timeout or self.timeout
+        try:
+            return self._get(url, headers, timeout)
+        except requests.exceptions.ConnectionError:
+            # A device that silently dropped an idle keep-alive socket shows up as a
+            # reset on the reused connection; retry once on a fresh one.
+            if not self._adapter.last_reused:
+                self._count("errors")
+                raise
+            self._count("stale_retries")
+            try:
+                return self._get(url, headers, timeout)
+            except requests.exceptions.RequestException:
+                self._count("errors")
+                raise
+        except requests.exceptions.RequestException:
+            self._count("errors")
+            raise
+
+    def _get(self, url, headers, timeout):
+        response = self.session.get(url, headers=headers, timeout=timeout, stream=True)
+        try:
+            chunks = []
+            size = 0
+            truncated = False
+            for chunk in response.iter_content(chunk_size=4096):
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > self.max_bytes:
+                    truncated = True
+                    break
+            body = b"".join(chunks)[:self.max_bytes]
+            if truncated:
+                self._count("truncated")
+            return DeviceResponse(response.status_code, response.headers, body, truncated)
+        finally:
+            # Releases the connection back to the pool when the body was fully read,
+            # otherwise closes it so a half-read socket is never reused
+            response.close()
+
+    def close(self):
+        self.session.close()
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_device_client():
+    """Return the process-wide DeviceClient, creating it on first use."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = DeviceClient()
+        return _shared_client
@@ -0,0 +1,236 @@
+"""Simulated Arduino hygrometers for load testing the poller.
+
+Each fake device listens on its own loopback port and serves the same
+TEMPERATURE/HUMIDITY page as the real DHM units. Latency, timeouts,
+malformed pages and connection resets can be mixed in per device.
+
+    python -m device_farm --devices 100 --base-port 18000 --config farm_config.json
+"""
+import argparse
+import asyncio
+import json
+import random
+import signal
+import socket
+import struct
+import threading
+
+PAGE_TEMPLATE = (
+    "<!DOCTYPE HTML>\r\n<html><head><meta http-equiv=\"refresh\" content=\"5\">"
+    "<title>DHM</title></head><body>"
+    "<h2>Digital Hygrometer</h2>"
+    "<p>TEMPERATURE: {temperature:.2f} C</p>"
+    "<p>HUMIDITY: {humidity:.2f} %</p>"
+    "</body></html>\r\n"
+)
+MALFORMED_PAGE = "<html><body><p>SENSOR ERROR</p></body></html>\r\n"
+
+
+class DeviceBehaviour:
+    """How one fake device answers.
+
+    latency is (min, max) seconds added before each response; the other
+    fields are probabilities per request.
+    """
+
+    def __init__(self, latency=(0.0, 0.0), timeout_rate=0.0, malformed_rate=0.0, reset_rate=0.0,
+                 keep_alive=True):
+        self.latency = latency
+        self.timeout_rate = timeout_rate
+        self.malformed_rate = malformed_rate
+        self.reset_rate = reset_rate
+        self.keep_alive = keep_alive
+
+
+class FakeDevice:
+    def __init__(self, port, behaviour, seed=None):
+        self.port = port
+        self.behaviour = behaviour
+        self.random = random.Random(seed if seed is not None else port)
+        self.temperature = self.random.uniform(18, 28)
+        self.humidity = self.random.uniform(35, 65)
+        self.requests = 0
+        self.connections = 0
+
+    def page(self):
+        # Slow random walk so consecutive readings differ a little
+        self.temperature += self.random.uniform(-0.05, 0.05)
+        self.humidity += self.random.uniform(-0.1, 0.1)
+        if self.random.random() < self.behaviour.malformed_rate:
+            return MALFORMED_PAGE
+        return PAGE_TEMPLATE.format(temperature=self.temperature, humidity=self.humidity)
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        behaviour = self.behaviour
+        try:
+            while True:
+                # Read one request (headers only; the poller never sends a body)
+                try:
+                    await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                self.requests += 1
+
+                low, high = behaviour.latency
+                if high > 0:
+                    await asyncio.sleep(self.random.uniform(low, high))
+                if self.random.random() < behaviour.timeout_rate:
+                    # Hold the socket open without answering until the client gives up
+                    await reader.read()
+                    return
+                if self.random.random() < behaviour.reset_rate:
+                    sock = writer.get_extra_info("socket")
+                    if sock is not None:
+                        # SO_LINGER 0 makes close() send an RST
+                        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                    writer.transport.abort()
+                    return
+
+                body = self.page().encode()
+                connection = "keep-alive" if behaviour.keep_alive else "close"
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n"
+                    + f"Content-Length: {len(body)}\r\nConnection: {connection}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+                if not behaviour.keep_alive:
+                    return
+        except asyncio.CancelledError:
+            return  # Farm shutting down
+        except ConnectionError:
+            return
+        finally:
+            writer.close()
+
+
+class DeviceFarm:
+    """Run many FakeDevices on consecutive loopback ports in a background thread."""
+
+    def __init__(self, count, base_port=18000, behaviour=None, behaviours=None, host="127.0.0.1"):
+        self.host = host
+        behaviours = behaviours or {}
+        self.devices = [
+            FakeDevice(base_port + n, behaviours.get(n, behaviour or DeviceBehaviour()))
+            for n in range(count)
+        ]
+        self._loop = None
+        self._servers = []
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None
+
+    @property
+    def addresses(self):
+        return [f"{self.host}:{device.port}" for device in self.devices]
+
+    def device_config(self):
+        """ip_config.json-style device list pointing at the farm."""
+        return [
+            {
+                "id": n + 1,
+                "ip": address,
+                "title": f"SIM/{n + 1:04d}",
+                "barcode": f"SIM{n + 1:05d}",
+                "location": f"Simulator rack {n // 50 + 1}",
+                "min_temp": 18.0,
+                "max_temp": 28.0,
+                "min_humidity": 30.0,
+                "max_humidity": 70.0,
+            }
+            for n, address in enumerate(self.addresses)
+        ]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="device-farm", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            # A port could not be bound; the servers already started were closed
+            self._thread.join()
+            self._loop = None
+            raise self._error
+        return self
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._start_servers())
+        except Exception as e:
+            self._error = e
+            for server in self._servers:
+                server.close()
+            self._loop.close()
+            return
+        finally:
+            self._ready.set()  # Never leave start() waiting, even when binding failed
+        self._loop.run_forever()
+
+    async def _start_servers(self):
+        for device in self.devices:
+            server = await asyncio.start_server(device.handle, self.host, device.port, backlog=128)
+            self._servers.append(server)
+
+    def stop(self):
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            for server in self._servers:
+                server.close()
+            for task in asyncio.all_tasks():
+                if task is not asyncio.current_task():
+                    task.cancel()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    def stats(self):
+        return {
+            "requests": sum(device.requests for device in self.devices),
+            "connections": sum(device.connections for device in self.devices),
+        }
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m device_farm", description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=13)
+    parser.add_argument("--base-port", type=int, default=18000)
+    parser.add_argument("--latency", type=float, nargs=2, default=(0.0, 0.0), metavar=("MIN", "MAX"))
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--reset-rate", type=float, default=0.0)
+    parser.add_argument("--no-keep-alive", action="store_true")
+    parser.add_argument("--config", help="write an ip_config.json for the farm to this path")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    behaviour = DeviceBehaviour(tuple(args.latency), args.timeout_rate, args.malformed_rate,
+                                args.reset_rate, keep_alive=not args.no_keep_alive)
+    farm = DeviceFarm(args.devices, args.base_port, behaviour).start()
+    if args.config:
+        with open(args.config, "w") as f:
+            json.dump({"ips": farm.device_config()}, f, indent=4)
+    print(f"Serving {args.devices} simulated devices on {farm.host}:{args.base_port}-{args.base_port + args.devices - 1}", flush=True)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    stop.wait()
+    farm.stop()
+    print(f"Stopped: {farm.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import threading
+from types import MappingProxyType
+
+
+class DeviceRegistry:
+    """The configured devices, indexed by id, IP, title and barcode.
+
+    All lookups are dict hits. Every change publishes a new immutable
+    snapshot (a tuple of read-only mappings), so the poll workers can iterate
+    the device list without locks while the GUI edits it. Ids come from a
+    counter that only moves forward, so a deleted device's id is never reused.
+    """
+
+    def __init__(self, devices=(), next_id=None):
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self._by_ip = {}
+        self._by_title = {}
+        self._by_barcode = {}
+        for device in devices:
+            self._index(dict(device))
+        highest = max(self._by_id, default=0)
+        self._next_id = max(next_id or 0, highest + 1)
+        self._snapshot = ()
+        self._publish()
+
+    def _index(self, device):
+        self._by_id[device['id']] = device
+        self._by_ip[device['ip']] = device
+        if device.get('title'):
+            self._by_title[device['title']] = device
+        if device.get('barcode'):
+            self._by_barcode[device['barcode']] = device
+
+    def _unindex(self, device, keep_slot=False):
+        if not keep_slot:
+            del self._by_id[device['id']]
+        self._by_ip.pop(device['ip'], None)
+        if self._by_title.get(device.get('title')) is device:
+            del self._by_title[device['title']]
+        if self._by_barcode.get(device.get('barcode')) is device:
+            del self._by_barcode[device['barcode']]
+
+    def _publish(self):
+        self._snapshot = tuple(MappingProxyType(device) for device in self._by_id.values())
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, device_id):
+        return device_id in self._by_id
+
+    @property
+    def next_id(self):
+        return self._next_id
+
+    def snapshot(self):
+        """Immutable view of every device, in insertion order."""
+        return self._snapshot
+
+    def get(self, device_id):
+        device = self._by_id.get(device_id)
+        return MappingProxyType(device) if device is not None else None
+
+    def by_ip(self, ip):
+        device = self._by_ip.get(ip)
+        return MappingProxyType(device) if device is not None else None
+
+    def by_title(self, title):
+        device = self._by_title.get(title)
+        return MappingProxyType(device) if device is not None else None
+
+    def by_barcode(self, barcode):
+        device = self._by_barcode.get(barcode)
+        return MappingProxyType(device) if device is not None else None
+
+    def add(self, fields):
+        """Register a new device and return it with its allocated id.
+
+        An unused 'id' in fields is kept (devices reloaded from the
+        configuration file); otherwise the next id is allocated.
+        Raises ValueError if the IP is already registered.
+        """
+        with self._lock:
+            if fields['ip'] in self._by_ip:
+                raise ValueError(f"IP address {fields['ip']} is already registered.")
+            device_id = fields.get('id')
+            if device_id is None or device_id in self._by_id:
+                device_id = self._next_id
+            self._next_id = max(self._next_id, device_id + 1)
+            device = dict(fields, id=device_id)
+            self._index(device)
+            self._publish()
+            return MappingProxyType(device)
+
+    def update(self, device_id, **fields):
+        """Change fields of an existing device; returns the updated device."""
+        with self._lock:
+            old = self._by_id[device_id]
+            if 'ip' in fields and fields['ip'] != old['ip'] and fields['ip'] in self._by_ip:
+                raise ValueError(f"IP address {fields['ip']} is already registered.")
+            device = dict(old, **fields, id=device_id)
+            self._unindex(old, keep_slot=True)  # Keep the device's position in the list
+            self._index(device)
+            self._publish()
+            return MappingProxyType(device)
+
+    def remove(self, device_id):
+        """Remove a device; returns it, or None if it was not registered."""
+        with self._lock:
+            device = self._by_id.get(device_id)
+            if device is None:
+                return None
+            self._unindex(device)
+            self._publish()
+            return MappingProxyType(device)
+
+    def to_list(self):
+        """Plain dicts for saving to ip_config.json."""
+        return [dict(device) for device in self._snapshot]
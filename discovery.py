@@ -0,0 +1,185 @@
+"""Find hygrometers on the network.
+
+Every address in the given CIDR ranges gets a cheap TCP connect probe first
+(many at once, paced by a rate limit). Only hosts that accept the connection
+are fetched and checked for a TEMPERATURE/HUMIDITY page.
+
+    python -m discovery 172.23.243.0/24 172.23.244.0/23 [--port 80] [--rate 1000]
+"""
+import argparse
+import asyncio
+import ipaddress
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# The DHM units live on 172.23.243.x - 172.23.246.x
+DEFAULT_RANGES = "172.23.243.0/24, 172.23.244.0/23, 172.23.246.0/24"
+DEFAULT_PORT = 80
+DEFAULT_RATE = 1000.0  # Connection attempts per second
+DEFAULT_CONCURRENCY = 512  # Probes in flight at once
+PROBE_TIMEOUT = 0.5
+FETCH_TIMEOUT = (1.0, 2.0)
+FETCH_WORKERS = 32
+MAX_ADDRESSES = 65536
+
+
+# Function to turn "172.23.243.0/24, 10.0.0.5" into a list of host addresses
+def parse_ranges(text):
+    addresses = []
+    seen = set()
+    for token in text.replace(",", " ").split():
+        network = ipaddress.ip_network(token, strict=False)  # Raises ValueError on bad input
+        hosts = [network.network_address] if network.num_addresses == 1 else network.hosts()
+        for host in hosts:
+            host = str(host)
+            if host not in seen:
+                seen.add(host)
+                addresses.append(host)
+                if len(addresses) > MAX_ADDRESSES:
+                    raise ValueError(f"More than {MAX_ADDRESSES} addresses to scan; use smaller ranges.")
+    return addresses
+
+
+class Discovered:
+    """A host whose page had a temperature or humidity reading."""
+
+    def __init__(self, ip, temperature, humidity):
+        self.ip = ip
+        self.temperature = temperature
+        self.humidity = humidity
+
+
+class SubnetScanner:
+    """Scan a list of addresses for hygrometers.
+
+    run() blocks until the scan is done; start() runs it on a background
+    thread. probed, responding and found can be read at any time for progress.
+    Addresses in `skip` (device IPs already registered) are not scanned.
+    """
+
+    def __init__(self, addresses, port=DEFAULT_PORT, rate=DEFAULT_RATE, concurrency=DEFAULT_CONCURRENCY,
+                 probe_timeout=PROBE_TIMEOUT, fetch_timeout=FETCH_TIMEOUT, skip=()):
+        self.port = port
+        self.rate = rate
+        self.concurrency = concurrency
+        self.probe_timeout = probe_timeout
+        self.fetch_timeout = fetch_timeout
+        skip = set(skip)
+        self.addresses = [host for host in addresses if self.device_address(host) not in skip]
+        self.total = len(self.addresses)
+        self.probed = 0
+        self.responding = 0
+        self.found = []
+        self.done = False
+        self.error = None
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def device_address(self, host):
+        """The address as written in ip_config.json."""
+        return host if self.port == 80 else f"{host}:{self.port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="discovery", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def run(self):
+        try:
+            asyncio.run(self._scan())
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+        return self.found
+
+    async def _scan(self):
+        from device_client import DeviceClient
+        from extractor import ReadingExtractor
+
+        # A separate client so the scan doesn't evict the poller's keep-alive connections
+        client = DeviceClient(*self.fetch_timeout, max_hosts=FETCH_WORKERS)
+        extractor = ReadingExtractor()
+        loop = asyncio.get_running_loop()
+        in_flight = asyncio.Semaphore(self.concurrency)
+        next_slot = [loop.time()]
+
+        async def probe(host):
+            async with in_flight:
+                if self._cancel.is_set():
+                    return False
+                # Space connection attempts evenly at the configured rate
+                now = loop.time()
+                slot = max(now, next_slot[0])
+                next_slot[0] = slot + 1.0 / self.rate
+                if slot > now:
+                    await asyncio.sleep(slot - now)
+                try:
+                    _, writer = await asyncio.wait_for(asyncio.open_connection(host, self.port), self.probe_timeout)
+                    writer.close()
+                    return True
+                except (OSError, asyncio.TimeoutError):
+                    return False
+                finally:
+                    self.probed += 1
+
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+            async def check(host):
+                if await probe(host):
+                    self.responding += 1
+                    device = await loop.run_in_executor(executor, self._identify, client, extractor, host)
+                    if device is not None:
+                        self.found.append(device)
+
+            await asyncio.gather(*(check(host) for host in self.addresses))
+
+    def _identify(self, client, extractor, host):
+        import requests
+
+        if self._cancel.is_set():
+            return None
+        address = self.device_address(host)
+        try:
+            response = client.get(f"http://{address}", timeout=self.fetch_timeout)
+        except requests.exceptions.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        temperature, humidity = extractor.extract(response.body)
+        if temperature is None and humidity is None:
+            return None  # Something else listening on the port
+        return Discovered(address, temperature, humidity)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m discovery", description=__doc__.splitlines()[0])
+    parser.add_argument("ranges", nargs="*", default=[DEFAULT_RANGES], help="CIDR ranges or single addresses")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="connection attempts per second")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    try:
+        addresses = parse_ranges(" ".join(args.ranges))
+    except ValueError as e:
+        parser.error(str(e))
+    scanner = SubnetScanner(addresses, args.port, args.rate, args.concurrency).start()
+    while not scanner.done:
+        scanner._thread.join(timeout=0.5)
+        print(f"\r{scanner.probed}/{scanner.total} probed, {scanner.responding} responding, "
+              f"{len(scanner.found)} hygrometers", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    if scanner.error is not None:
+        print(f"Scan failed: {scanner.error}", file=sys.stderr)
+        return 1
+    for device in scanner.found:
+        print(f"{device.ip}\t{device.temperature}\t{device.humidity}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
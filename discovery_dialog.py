@@ -0,0 +1,169 @@
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QProgressBar,
+    QTableWidget, QTableWidgetItem, QMessageBox, QHeaderView
+)
+from PyQt5.QtCore import Qt, QTimer
+from discovery import DEFAULT_PORT, DEFAULT_RANGES, SubnetScanner, parse_ranges
+
+RESULT_COLUMNS = ["IP Address", "Temperature (°C)", "Humidity (%)", "DHM No", "Barcode No"]
+
+
+class DiscoveryDialog(QDialog):
+    """Scan address ranges for hygrometers and register the ones picked in bulk.
+
+    register(devices) is called with a list of ip_config.json-style dicts for
+    the checked rows and returns the number actually added.
+    """
+
+    def __init__(self, registered_ips, register, ranges=DEFAULT_RANGES, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Discover Devices")
+        self.resize(800, 500)
+        self.registered_ips = set(registered_ips)
+        self.register = register
+        self.scanner = None
+
+        self.ranges_input = QLineEdit(ranges)
+        self.port_input = QLineEdit(str(DEFAULT_PORT))
+        self.port_input.setMaximumWidth(70)
+        self.scan_button = QPushButton("Scan")
+        self.scan_button.clicked.connect(self.toggle_scan)
+
+        range_layout = QHBoxLayout()
+        range_layout.addWidget(QLabel("Ranges:"))
+        range_layout.addWidget(self.ranges_input)
+        range_layout.addWidget(QLabel("Port:"))
+        range_layout.addWidget(self.port_input)
+        range_layout.addWidget(self.scan_button)
+
+        self.progress = QProgressBar()
+        self.status_label = QLabel("Enter CIDR ranges separated by commas.")
+
+        self.results = QTableWidget(0, len(RESULT_COLUMNS))
+        self.results.setHorizontalHeaderLabels(RESULT_COLUMNS)
+        self.results.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.results.verticalHeader().setVisible(False)
+
+        # Shared fields for every device registered in one go
+        self.location_input = QLineEdit()
+        self.min_temp_input = QLineEdit()
+        self.max_temp_input = QLineEdit()
+        self.min_humidity_input = QLineEdit()
+        self.max_humidity_input = QLineEdit()
+        self.register_button = QPushButton("Register Checked")
+        self.register_button.clicked.connect(self.register_checked)
+
+        register_layout = QHBoxLayout()
+        register_layout.addWidget(QLabel("Location:"))
+        register_layout.addWidget(self.location_input)
+        register_layout.addWidget(QLabel("Min Temp:"))
+        register_layout.addWidget(self.min_temp_input)
+        register_layout.addWidget(QLabel("Max Temp:"))
+        register_layout.addWidget(self.max_temp_input)
+        register_layout.addWidget(QLabel("Min Humidity:"))
+        register_layout.addWidget(self.min_humidity_input)
+        register_layout.addWidget(QLabel("Max Humidity:"))
+        register_layout.addWidget(self.max_humidity_input)
+        register_layout.addWidget(self.register_button)
+
+        layout = QVBoxLayout()
+        layout.addLayout(range_layout)
+        layout.addWidget(self.progress)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.results)
+        layout.addLayout(register_layout)
+        self.setLayout(layout)
+
+        # The scan runs on its own thread; this timer copies its progress into the dialog
+        self.progress_timer = QTimer(self)
+        self.progress_timer.timeout.connect(self.update_progress)
+
+    def toggle_scan(self):
+        if self.scanner is not None and not self.scanner.done:
+            self.scanner.cancel()
+            self.scan_button.setEnabled(False)
+            return
+        try:
+            addresses = parse_ranges(self.ranges_input.text())
+            port = int(self.port_input.text())
+        except ValueError as e:
+            QMessageBox.warning(self, "Warning", str(e))
+            return
+        self.results.setRowCount(0)
+        self.scanner = SubnetScanner(addresses, port=port, skip=self.registered_ips).start()
+        self.progress.setRange(0, max(self.scanner.total, 1))
+        self.progress.setValue(0)
+        self.scan_button.setText("Stop")
+        self.progress_timer.start(100)
+
+    def update_progress(self):
+        scanner = self.scanner
+        self.progress.setValue(scanner.probed)
+        self.status_label.setText(
+            f"{scanner.probed} of {scanner.total} addresses probed, {scanner.responding} responding, "
+            f"{len(scanner.found)} hygrometers found"
+        )
+        for device in scanner.found[self.results.rowCount():]:
+            self.add_result(device)
+        if scanner.done:
+            self.progress_timer.stop()
+            self.scan_button.setText("Scan")
+            self.scan_button.setEnabled(True)
+            if scanner.error is not None:
+                QMessageBox.warning(self, "Error", f"Scan failed: {scanner.error}")
+
+    def add_result(self, device):
+        row = self.results.rowCount()
+        self.results.insertRow(row)
+        ip_item = QTableWidgetItem(device.ip)
+        ip_item.setFlags(Qt.ItemIsUserCheckable | Qt.ItemIsEnabled)
+        ip_item.setCheckState(Qt.Checked)
+        self.results.setItem(row, 0, ip_item)
+        for column, value in ((1, device.temperature), (2, device.humidity)):
+            item = QTableWidgetItem("N/A" if value is None else f"{value:.1f}")
+            item.setFlags(Qt.ItemIsEnabled)
+            self.results.setItem(row, column, item)
+        # DHM No defaults to the last octet(s); both fields can be edited before registering
+        self.results.setItem(row, 3, QTableWidgetItem(f"DHM {device.ip.split(':')[0].split('.', 2)[-1]}"))
+        self.results.setItem(row, 4, QTableWidgetItem(""))
+
+    def register_checked(self):
+        location = self.location_input.text().strip()
+        if not location:
+            QMessageBox.warning(self, "Warning", "Please enter a location for the new devices.")
+            return
+        try:
+            limits = {
+                key: float(field.text()) if field.text() else None
+                for key, field in (("min_temp", self.min_temp_input), ("max_temp", self.max_temp_input),
+                                   ("min_humidity", self.min_humidity_input),
+                                   ("max_humidity", self.max_humidity_input))
+            }
+        except ValueError:
+            QMessageBox.warning(self, "Warning", "Limits must be numbers.")
+            return
+
+        devices = []
+        for row in range(self.results.rowCount()):
+            if self.results.item(row, 0).checkState() != Qt.Checked:
+                continue
+            devices.append(dict(
+                ip=self.results.item(row, 0).text(),
+                title=self.results.item(row, 3).text().strip(),
+                barcode=self.results.item(row, 4).text().strip(),
+                location=location,
+                **limits,
+            ))
+        if not devices:
+            QMessageBox.warning(self, "Warning", "No devices are checked.")
+            return
+        added = self.register(devices)
+        QMessageBox.information(self, "Success", f"{added} of {len(devices)} devices registered.")
+        if added:
+            self.accept()
+
+    def done(self, result):
+        # Closing the dialog stops a scan that is still running
+        if self.scanner is not None:
+            self.scanner.cancel()
+        super().done(result)
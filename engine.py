@@ -0,0 +1,189 @@
+import logging
+import threading
+import time
+from scheduler import PollScheduler
+from config_store import CONFIG_FILE, ConfigStore
+from health import HealthTracker
+from metrics import (
+    METRICS, FETCH_SECONDS, PARSE_SECONDS, SWEEP_SECONDS, ERRORS, READINGS,
+    Counter, RateLimitedLogger,
+)
+
+# Nothing in this module imports PyQt5. requests, bs4 and numpy are only
+# imported when polling starts or history is switched on, so the
+# headless runner starts without loading the GUI stack.
+
+logger = logging.getLogger("dth")
+# Per-device log lines are limited to one per minute per message kind
+device_log = RateLimitedLogger(logger, interval=60.0)
+
+# Function to load the whole configuration file (device list and id counter), journalled edits included
+def load_config(path=CONFIG_FILE):
+    return ConfigStore(path).load()
+
+# Function to check a reading against its min/max limits (None = no reading)
+def out_of_range(value, low, high):
+    if value is None:
+        return None
+    return (low is not None and value < low) or (high is not None and value > high)
+
+# Function to fetch temperature and humidity for a given IP
+def get_temperature_and_humidity(ip, timeout=None):
+    import requests
+    from device_client import get_device_client
+    from extractor import get_extractor
+    from fetch_cache import get_fetch_cache
+
+    url = f"http://{ip}"  # Create the URL based on the IP address
+    cache = get_fetch_cache()
+    start = time.perf_counter()
+    try:
+        # Conditional request when the device sent an ETag or Last-Modified last time
+        response = get_device_client().get(url, headers=cache.request_headers(ip), timeout=timeout)
+    except requests.exceptions.RequestException as e:
+        FETCH_SECONDS.observe(time.perf_counter() - start, ip)
+        ERRORS.inc(type(e).__name__)
+        device_log.log(logging.WARNING, ("request", ip), "Request exception for %s: %s", ip, e)
+        return None, None
+    FETCH_SECONDS.observe(time.perf_counter() - start, ip)
+
+    # Response bodies are only logged at DEBUG level, and rate-limited
+    device_log.log(logging.DEBUG, ("response", ip), "Response from %s: %s - %.200r",
+                   ip, response.status_code, response.body)
+
+    # 304 Not Modified: the last readings still stand
+    values = cache.not_modified(ip) if response.status_code == 304 else None
+    if values is None:
+        if response.status_code != 200:
+            ERRORS.inc(f"http_{response.status_code}")
+            device_log.log(logging.WARNING, ("status", ip), "Non-200 response for IP %s: %s",
+                           ip, response.status_code)
+            return None, None  # Return no data for non-200 responses
+
+        # A byte-identical page gives the same readings as last time, without parsing it again
+        digest, values = cache.lookup(ip, response.body)
+        if values is None:
+            # Pull the readings out of the raw page (falls back to BeautifulSoup when needed)
+            start = time.perf_counter()
+            values = get_extractor().extract(response.body, key=ip)
+            PARSE_SECONDS.observe(time.perf_counter() - start)
+            if not response.truncated:
+                cache.store(ip, response.headers, digest, values)
+
+    temperature, humidity = values
+    if temperature is None or humidity is None:
+        ERRORS.inc("parse_incomplete")
+
+    device_log.log(logging.DEBUG, ("parsed", ip), "Parsed data for %s - Temperature: %s, Humidity: %s",
+                   ip, temperature, humidity)
+    return temperature, humidity
+
+# Function to expose the HTTP client and extractor counters at scrape time
+def collect_pipeline_stats():
+    import sys
+    metrics = []
+    if "device_client" in sys.modules:
+        from device_client import get_device_client
+        connections = Counter("dth_http_client_total", "Device HTTP client events.", ("event",))
+        for name, value in get_device_client().stats().items():
+            connections.inc(name, amount=value)
+        metrics.append(connections)
+    if "extractor" in sys.modules:
+        from extractor import get_extractor
+        parses = Counter("dth_parses_total", "Page parses by extractor path.", ("path",))
+        for name, value in get_extractor().stats().items():
+            parses.inc(name, amount=value)
+        metrics.append(parses)
+    return metrics
+
+
+METRICS.add_collector(collect_pipeline_stats)
+
+
+class PollingEngine:
+    """Polling core shared by the GUI and the headless runner.
+
+    Wires the scheduler, circuit breaker and (optional) history store to a
+    DeviceRegistry and calls ``on_reading(ip_data, temperature, humidity, ts)``
+    from the worker threads for every completed poll.
+    """
+
+    def __init__(self, registry, on_reading, history=None, health=None, **scheduler_options):
+        self.registry = registry
+        self.on_reading = on_reading
+        self.history = history
+        self.health = health or HealthTracker()
+        self._sweep_lock = threading.Lock()
+        self._sweep_pending = None
+        self._sweep_snapshot = None
+        self._sweep_start = time.monotonic()
+        self._ips = set()
+        self.scheduler = PollScheduler(
+            registry.snapshot, self._fetch, self._on_result, next_delay=self._next_delay, **scheduler_options
+        )
+
+    def start(self):
+        self._sweep_start = time.monotonic()
+        self._reserve_connections()
+        self._ips = {ip_data['ip'] for ip_data in self.registry.snapshot()}
+        self.scheduler.start()
+
+    def stop(self, wait=False):
+        """Stop polling; with wait=True, also wait for the fetches in progress."""
+        self.scheduler.stop(wait=wait)
+
+    def refresh(self):
+        """Pick up devices added to or removed from the registry."""
+        self._reserve_connections()
+        self._forget_removed()
+        self.scheduler.refresh()
+
+    def _reserve_connections(self):
+        # One keep-alive pool per device, however large the fleet grows
+        from device_client import get_device_client
+        get_device_client().reserve_hosts(len(self.registry))
+
+    def _forget_removed(self):
+        # Drop what was learned about the pages of devices deleted or moved to another address
+        from extractor import get_extractor
+        from fetch_cache import get_fetch_cache
+        ips = {ip_data['ip'] for ip_data in self.registry.snapshot()}
+        for ip in self._ips - ips:
+            get_extractor().forget(ip)
+            get_fetch_cache().forget(ip)
+        self._ips = ips
+
+    def _fetch(self, ip_data):
+        # Open circuits get a light probe with short timeouts
+        timeout = self.health.begin_poll(ip_data['id'])
+        return get_temperature_and_humidity(ip_data['ip'], timeout=timeout)
+
+    def _on_result(self, ip_data, result):
+        ts = time.time()
+        temperature, humidity = result if result else (None, None)
+        self.health.record(ip_data['id'], temperature is not None or humidity is not None)
+        READINGS.inc()
+        self._track_sweep(ip_data['id'])
+        if self.history is not None:
+            self.history.append(ip_data['id'], temperature, humidity, ts=ts)
+        self.on_reading(ip_data, temperature, humidity, ts)
+
+    def _track_sweep(self, device_id):
+        # A sweep ends once every device in the registry has reported at least once
+        with self._sweep_lock:
+            snapshot = self.registry.snapshot()
+            if self._sweep_pending is None:
+                self._sweep_pending = {ip_data['id'] for ip_data in snapshot}
+            elif snapshot is not self._sweep_snapshot:
+                # Don't wait on devices deleted mid-sweep
+                self._sweep_pending &= {ip_data['id'] for ip_data in snapshot}
+            self._sweep_snapshot = snapshot
+            self._sweep_pending.discard(device_id)
+            if not self._sweep_pending:
+                now = time.monotonic()
+                SWEEP_SECONDS.observe(now - self._sweep_start)
+                self._sweep_start = now
+                self._sweep_pending = None
+
+    def _next_delay(self, ip_data, delay):
+        return self.health.next_delay(ip_data['id'], delay)
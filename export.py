@@ -0,0 +1,313 @@
+"""Export reading history to CSV or Parquet.
+
+Records are read from the history store one time window per device at a
+time and written as they come, so memory use stays flat however much
+history is exported. Unless a tier is given, each part of the range comes
+from the finest tier that still holds it (raw readings, then minute and hour
+means further back), and the tier column says which. Parquet needs pyarrow.
+
+    python -m export --output audit.csv [--location "Line 3"] [--device DHM-12]
+                     [--start 2026-01-01] [--end 2026-02-01] [--interval 3600]
+                     [--format csv|parquet] [--tier raw|minute|hour]
+"""
+import argparse
+import csv
+import io
+import sys
+import threading
+from datetime import datetime
+import numpy as np
+from history import TIERS
+
+TIER_WIDTHS = dict(TIERS)
+
+RAW_FIELDS = ["device_id", "title", "barcode", "location", "timestamp", "temperature", "humidity", "status", "tier"]
+AGGREGATE_FIELDS = [
+    "device_id", "title", "barcode", "location", "interval_start", "samples",
+    "temperature_min", "temperature_max", "temperature_mean",
+    "humidity_min", "humidity_max", "humidity_mean", "tier",
+]
+CHUNK_RECORDS = 100000  # Roughly how many records are read per query (~2 MB)
+
+
+# Function to pick the devices matching the export filters
+def select_devices(devices, device=None, location=None):
+    """device matches id, DHM No (title), barcode or IP; location matches exactly (case-insensitive)."""
+    selected = []
+    for ip_data in devices:
+        if device and device not in (str(ip_data['id']), ip_data.get('title'), ip_data.get('barcode'),
+                                     ip_data['ip']):
+            continue
+        if location and (ip_data.get('location') or "").casefold() != location.casefold():
+            continue
+        selected.append(ip_data)
+    return selected
+
+
+# Function to compute min/max/mean per interval for one chunk of time-ordered records
+def aggregate(records, interval):
+    """Returns a dict of column arrays; NaN readings are ignored (all-NaN intervals give NaN)."""
+    starts = records["ts"] - records["ts"] % interval
+    edges = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    columns = {"interval_start": starts[edges], "samples": np.diff(np.r_[edges, len(records)])}
+    for field in ("temperature", "humidity"):
+        values = records[field].astype(np.float64)
+        valid = ~np.isnan(values)
+        counts = np.add.reduceat(valid, edges)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            columns[f"{field}_min"] = np.fmin.reduceat(values, edges)
+            columns[f"{field}_max"] = np.fmax.reduceat(values, edges)
+            columns[f"{field}_mean"] = np.add.reduceat(np.where(valid, values, 0.0), edges) / counts
+    return columns
+
+
+# Function to stream history as (device, columns) chunks
+def iter_chunks(store, devices, start=None, end=None, tier=None, interval=None):
+    """Yield (ip_data, {column: array, "tier": name}) per time window and device.
+
+    Without a tier, the range is split into segments of the finest tier
+    that covers each part (see HistoryStore.coverage). Windows are sized to
+    hold about CHUNK_RECORDS records and are aligned to `interval`, so no
+    aggregate is split across chunks of the same tier.
+    """
+    for ip_data in devices:
+        device_id = ip_data['id']
+        if tier is None:
+            segments = store.coverage(device_id, start, end)
+        else:
+            span = store.span(device_id, tier)
+            if span is None:
+                continue
+            oldest, newest = span
+            stop = np.nextafter(newest, np.inf)
+            segments = [(tier, oldest if start is None else max(start, oldest),
+                         stop if end is None else min(end, stop))]
+        for name, lo, hi in segments:
+            for columns in _segment_chunks(store, device_id, name, lo, hi, interval):
+                yield ip_data, columns
+
+
+def _segment_chunks(store, device_id, tier, lo, hi, interval):
+    window = (TIER_WIDTHS[tier] or 1.0 / store.raw_rate) * CHUNK_RECORDS
+    t = lo
+    if interval:
+        window = max(window - window % interval, interval)
+        t -= t % interval
+    while t < hi:
+        records = store.query(device_id, max(t, lo), min(t + window, hi), tier)
+        if len(records):
+            columns = aggregate(records, interval) if interval else {
+                "ts": records["ts"], "temperature": records["temperature"],
+                "humidity": records["humidity"], "status": records["status"],
+            }
+            columns["tier"] = tier
+            yield columns
+        t += window
+
+
+def _utc_offset(ts):
+    return int(datetime.fromtimestamp(ts).astimezone().utcoffset().total_seconds())
+
+
+def _local_times(ts):
+    """ISO local-time strings for an array of epoch seconds, formatted in bulk.
+
+    The UTC offset is looked up once per UTC day, so a chunk covering years
+    still gets summer and winter time right; rows on a day with a DST change
+    are formatted one by one.
+    """
+    if not len(ts):
+        return np.empty(0, dtype=str)
+    days, index = np.unique(np.floor_divide(ts, 86400), return_inverse=True)
+    day_start = np.array([_utc_offset(day * 86400) for day in days.tolist()], dtype=np.int64)
+    day_end = np.array([_utc_offset((day + 1) * 86400) for day in days.tolist()], dtype=np.int64)
+    local = ts.astype(np.int64) + day_start[index]
+    text = np.datetime_as_string(local.astype("datetime64[s]"))
+    changing = np.flatnonzero(day_start[index] != day_end[index])
+    if len(changing):
+        text[changing] = [datetime.fromtimestamp(t).isoformat(timespec="seconds") for t in ts[changing].tolist()]
+    return text
+
+
+def _number_text(values):
+    """Values rounded to 2 decimals as strings; NaN becomes an empty field."""
+    text = np.round(values.astype(np.float64), 2).astype(str)
+    text[np.isnan(values)] = ""
+    return text
+
+
+def _csv_lines(ip_data, columns, interval):
+    # The device columns are quoted once; readings are converted to text column by column
+    prefix = io.StringIO()
+    csv.writer(prefix, lineterminator="").writerow(
+        [ip_data['id'], ip_data.get('title') or "", ip_data.get('barcode') or "", ip_data.get('location') or ""]
+    )
+    if interval:
+        fields = [_local_times(columns["interval_start"]), columns["samples"].astype(str)]
+        fields += [_number_text(columns[name]) for name in AGGREGATE_FIELDS[6:-1]]
+    else:
+        fields = [_local_times(columns["ts"]), _number_text(columns["temperature"]),
+                  _number_text(columns["humidity"]), columns["status"].astype(str)]
+    prefix = prefix.getvalue() + ","
+    suffix = "," + columns["tier"] + "\n"
+    return "".join(prefix + ",".join(row) + suffix for row in zip(*(field.tolist() for field in fields)))
+
+
+class CsvExportWriter:
+    def __init__(self, path, fields):
+        self.file = open(path, "w", newline="")
+        csv.writer(self.file, lineterminator="\n").writerow(fields)
+
+    def write(self, ip_data, columns, interval):
+        self.file.write(_csv_lines(ip_data, columns, interval))
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetExportWriter:
+    """Writes one row group per chunk; requires pyarrow."""
+
+    def __init__(self, path, fields):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow).")
+        self.pa = pa
+        self.fields = fields
+        types = {
+            "device_id": pa.int64(), "title": pa.string(), "barcode": pa.string(), "location": pa.string(),
+            "tier": pa.string(),
+            "timestamp": pa.timestamp("ms"), "interval_start": pa.timestamp("ms"), "status": pa.uint32(),
+            "samples": pa.int64(),
+        }
+        self.schema = pa.schema([(name, types.get(name, pa.float32())) for name in fields])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, ip_data, columns, interval):
+        pa = self.pa
+        n = len(columns["interval_start" if interval else "ts"])
+        data = {
+            "device_id": np.full(n, ip_data['id'], dtype=np.int64),
+            "title": [ip_data.get('title') or ""] * n,
+            "barcode": [ip_data.get('barcode') or ""] * n,
+            "location": [ip_data.get('location') or ""] * n,
+            "tier": [columns["tier"]] * n,
+        }
+        if interval:
+            data["interval_start"] = (columns["interval_start"] * 1000).astype(np.int64).astype("datetime64[ms]")
+            for name in AGGREGATE_FIELDS[5:-1]:
+                data[name] = columns[name]
+        else:
+            data["timestamp"] = (columns["ts"] * 1000).astype(np.int64).astype("datetime64[ms]")
+            for name in ("temperature", "humidity", "status"):
+                data[name] = columns[name]
+        arrays = [pa.array(data[name], type=self.schema.field(name).type, from_pandas=True) for name in self.fields]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {"csv": CsvExportWriter, "parquet": ParquetExportWriter}
+
+
+class ExportJob:
+    """Run one export on a background thread.
+
+    devices_done, devices_total and rows can be read at any time for
+    progress; done and error tell how it finished.
+    """
+
+    def __init__(self, store, devices, path, fmt="csv", start=None, end=None, tier=None, interval=None):
+        self.store = store
+        self.devices = list(devices)
+        self.path = path
+        self.fmt = fmt
+        self.start = start
+        self.end = end
+        self.tier = tier
+        self.interval = interval
+        self.devices_total = len(self.devices)
+        self.devices_done = 0
+        self.rows = 0
+        self.done = False
+        self.error = None
+        self._cancel = threading.Event()
+        self._thread = None
+
+    def start_thread(self):
+        self._thread = threading.Thread(target=self.run, name="export", daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+
+    def run(self):
+        writer = None
+        try:
+            writer = WRITERS[self.fmt](self.path, AGGREGATE_FIELDS if self.interval else RAW_FIELDS)
+            for ip_data in self.devices:
+                for _, columns in iter_chunks(self.store, [ip_data], self.start, self.end, self.tier, self.interval):
+                    if self._cancel.is_set():
+                        return
+                    writer.write(ip_data, columns, self.interval)
+                    self.rows += len(next(iter(columns.values())))
+                self.devices_done += 1
+        except Exception as e:
+            self.error = e
+        finally:
+            if writer is not None:
+                writer.close()
+            self.done = True
+
+
+def _parse_time(text):
+    return datetime.fromisoformat(text).timestamp() if text else None
+
+
+def main(argv=None):
+    from config_store import ConfigError
+    from engine import CONFIG_FILE, load_config
+    from history import HistoryStore
+
+    parser = argparse.ArgumentParser(prog="python -m export", description=__doc__.splitlines()[0])
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--format", choices=sorted(WRITERS), default=None,
+                        help="default: from the output file extension, else csv")
+    parser.add_argument("--config", default=CONFIG_FILE)
+    parser.add_argument("--history", default="history", help="history directory (default: %(default)s)")
+    parser.add_argument("--device", help="id, DHM No, barcode or IP of one device")
+    parser.add_argument("--location")
+    parser.add_argument("--start", help="ISO date/time, e.g. 2026-01-01 or 2026-01-01T08:00")
+    parser.add_argument("--end")
+    parser.add_argument("--tier", choices=("raw", "minute", "hour"), help="default: the finest tier holding each part of the range")
+    parser.add_argument("--interval", type=float, help="aggregate min/max/mean per this many seconds")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    try:
+        devices = select_devices(load_config(args.config).get("ips", []), args.device, args.location)
+    except (OSError, ConfigError) as e:
+        parser.error(f"could not load the device list: {e}")
+    if not devices:
+        parser.error("no devices match the filters")
+    store = HistoryStore(args.history)
+    job = ExportJob(store, devices, args.output, fmt, _parse_time(args.start), _parse_time(args.end),
+                    args.tier, args.interval)
+    job.run()
+    store.close()
+    if job.error is not None:
+        print(f"Export failed: {job.error}", file=sys.stderr)
+        return 1
+    print(f"Exported {job.rows} rows for {job.devices_done} devices to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
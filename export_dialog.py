@@ -0,0 +1,124 @@
+from PyQt5.QtWidgets import (
+    QDialog, QVBoxLayout, QFormLayout, QHBoxLayout, QComboBox, QDateTimeEdit, QPushButton,
+    QProgressBar, QLabel, QFileDialog, QMessageBox
+)
+from PyQt5.QtCore import QDateTime, QTimer
+from export import ExportJob, select_devices
+
+ALL_DEVICES = "All devices"
+ALL_LOCATIONS = "All locations"
+INTERVALS = [("None (every reading)", None), ("Minute", 60), ("Hour", 3600), ("Day", 86400)]
+FORMATS = [("CSV", "csv", "CSV files (*.csv)"), ("Parquet", "parquet", "Parquet files (*.parquet)")]
+
+
+class ExportDialog(QDialog):
+    """Pick devices, a time range and an optional aggregate, then export on a background thread."""
+
+    def __init__(self, history, devices, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Export History")
+        self.history = history
+        self.devices = list(devices)
+        self.job = None
+
+        self.device_combo = QComboBox()
+        self.device_combo.addItem(ALL_DEVICES)
+        for ip_data in self.devices:
+            self.device_combo.addItem(ip_data.get('title') or ip_data['ip'], ip_data['id'])
+        self.location_combo = QComboBox()
+        self.location_combo.addItem(ALL_LOCATIONS)
+        self.location_combo.addItems(sorted({ip_data.get('location') for ip_data in self.devices} - {None, ""}))
+
+        now = QDateTime.currentDateTime()
+        self.start_edit = QDateTimeEdit(now.addDays(-7))
+        self.end_edit = QDateTimeEdit(now)
+        for edit in (self.start_edit, self.end_edit):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("yyyy-MM-dd HH:mm")
+
+        self.interval_combo = QComboBox()
+        for label, seconds in INTERVALS:
+            self.interval_combo.addItem(label, seconds)
+        self.format_combo = QComboBox()
+        for label, fmt, file_filter in FORMATS:
+            self.format_combo.addItem(label, (fmt, file_filter))
+
+        form = QFormLayout()
+        form.addRow("Device:", self.device_combo)
+        form.addRow("Location:", self.location_combo)
+        form.addRow("From:", self.start_edit)
+        form.addRow("To:", self.end_edit)
+        form.addRow("Aggregate per:", self.interval_combo)
+        form.addRow("Format:", self.format_combo)
+
+        self.progress = QProgressBar()
+        self.status_label = QLabel()
+        self.export_button = QPushButton("Export...")
+        self.export_button.clicked.connect(self.start_export)
+        self.close_button = QPushButton("Close")
+        self.close_button.clicked.connect(self.reject)
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(self.export_button)
+        buttons.addWidget(self.close_button)
+
+        layout = QVBoxLayout()
+        layout.addLayout(form)
+        layout.addWidget(self.progress)
+        layout.addWidget(self.status_label)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        # The export runs on its own thread; this timer copies its progress into the dialog
+        self.progress_timer = QTimer(self)
+        self.progress_timer.timeout.connect(self.update_progress)
+
+    def selected_devices(self):
+        device_id = self.device_combo.currentData()
+        location = self.location_combo.currentText()
+        return select_devices(
+            self.devices,
+            device=None if device_id is None else str(device_id),
+            location=None if location == ALL_LOCATIONS else location,
+        )
+
+    def start_export(self):
+        devices = self.selected_devices()
+        if not devices:
+            QMessageBox.warning(self, "Warning", "No devices match the selected device and location.")
+            return
+        start = self.start_edit.dateTime().toSecsSinceEpoch()
+        end = self.end_edit.dateTime().toSecsSinceEpoch()
+        if end <= start:
+            QMessageBox.warning(self, "Warning", "The end time must be after the start time.")
+            return
+        fmt, file_filter = self.format_combo.currentData()
+        path, _ = QFileDialog.getSaveFileName(self, "Export History", f"history.{fmt}", file_filter)
+        if not path:
+            return
+
+        self.job = ExportJob(self.history, devices, path, fmt, start, end,
+                             interval=self.interval_combo.currentData()).start_thread()
+        self.progress.setRange(0, self.job.devices_total)
+        self.progress.setValue(0)
+        self.export_button.setEnabled(False)
+        self.progress_timer.start(200)
+
+    def update_progress(self):
+        job = self.job
+        self.progress.setValue(job.devices_done)
+        self.status_label.setText(f"{job.rows} rows written, {job.devices_done} of {job.devices_total} devices")
+        if not job.done:
+            return
+        self.progress_timer.stop()
+        self.export_button.setEnabled(True)
+        if job.error is not None:
+            QMessageBox.warning(self, "Error", f"Export failed: {job.error}")
+        elif job.devices_done == job.devices_total:
+            QMessageBox.information(self, "Exported", f"{job.rows} rows written to {job.path}.")
+
+    def done(self, result):
+        # Closing the dialog stops an export that is still running
+        if self.job is not None:
+            self.job.cancel()
+        super().done(result)
@@ -0,0 +1,142 @@
+import re
+import threading
+
+# Same number pattern the original BeautifulSoup scrape used, on str and bytes
+NUMBER_PATTERN = r"[-+]?\d*\.\d+|\d+"
+_NUMBER_TEXT = re.compile(NUMBER_PATTERN)
+_NUMBER_BYTES = re.compile(NUMBER_PATTERN.encode())
+_LABEL_TEXT = {
+    "temperature": re.compile("TEMPERATURE", re.IGNORECASE),
+    "humidity": re.compile("HUMIDITY", re.IGNORECASE),
+}
+_LABEL_BYTES = {
+    "temperature": re.compile(b"TEMPERATURE", re.IGNORECASE),
+    "humidity": re.compile(b"HUMIDITY", re.IGNORECASE),
+}
+
+
+def parse_with_soup(html):
+    """Reference parser: full BeautifulSoup parse, as the app always did."""
+    from bs4 import BeautifulSoup  # Only needed for the fallback path
+
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
+    soup = BeautifulSoup(html, "html.parser")
+
+    values = []
+    for name in ("temperature", "humidity"):
+        value = None
+        text = soup.find(string=_LABEL_TEXT[name])
+        if text:
+            match = _NUMBER_TEXT.search(text)
+            if match:
+                value = float(match.group())
+        values.append(value)
+    return tuple(values)
+
+
+def _scan_value(body, name, label=None):
+    # Find the label, then search the text node it sits in (from the previous
+    # '>' to the next '<'), which is exactly what soup.find(string=...) returns
+    if label is not None:
+        pos = body.find(label)
+        if pos < 0:
+            return None, None
+        found = label
+    else:
+        match = _LABEL_BYTES[name].search(body)
+        if not match:
+            return None, None
+        pos = match.start()
+        found = match.group()
+
+    end = body.find(b"<", pos)
+    if end < 0:
+        return None, found
+    start = body.rfind(b">", 0, pos) + 1
+    match = _NUMBER_BYTES.search(body, start, end)
+    return (float(match.group()) if match else None), found
+
+
+def scan_bytes(body, profile=None):
+    """Fast path: pull (temperature, humidity) floats straight out of the raw page bytes."""
+    temperature, _ = _scan_value(body, "temperature", profile.temperature_label if profile else None)
+    humidity, _ = _scan_value(body, "humidity", profile.humidity_label if profile else None)
+    return temperature, humidity
+
+
+class PageProfile:
+    """What one device's page looks like, learned from its first full parse.
+
+    Stores the exact label bytes the device prints, so later scans use a plain
+    bytes.find() instead of a case-insensitive regex. If the fast scan ever
+    disagreed with BeautifulSoup on this page, ``fast`` is False and the device
+    always goes through the soup parser.
+    """
+
+    def __init__(self, temperature_label, humidity_label, fast):
+        self.temperature_label = temperature_label
+        self.humidity_label = humidity_label
+        self.fast = fast
+
+
+class ReadingExtractor:
+    """Pluggable reading extractor with per-device page profiles.
+
+    The first page from each device is parsed both ways; when the byte scan
+    matches the BeautifulSoup result the device is switched to the fast path.
+    A fast scan that comes back incomplete falls back to the soup parser and
+    the profile is learned again.
+    """
+
+    def __init__(self, fallback=parse_with_soup):
+        self.fallback = fallback
+        self._profiles = {}
+        self._lock = threading.Lock()
+        self._stats = {"fast": 0, "fallback": 0, "learned": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def profile(self, key):
+        return self._profiles.get(key)
+
+    def forget(self, key):
+        self._profiles.pop(key, None)
+
+    def extract(self, body, key=None):
+        """Return (temperature, humidity) as floats (or None) for one page body."""
+        profile = self._profiles.get(key) if key is not None else None
+        if profile is not None and profile.fast:
+            temperature, humidity = scan_bytes(body, profile)
+            if temperature is not None and humidity is not None:
+                self._count("fast")
+                return temperature, humidity
+        return self._learn(body, key)
+
+    def _learn(self, body, key):
+        self._count("fallback")
+        expected = self.fallback(body)
+        if key is None:
+            return expected
+
+        temperature, temp_label = _scan_value(body, "temperature")
+        humidity, hum_label = _scan_value(body, "humidity")
+        if temp_label is not None and hum_label is not None:
+            fast = (temperature, humidity) == expected and None not in expected
+            self._profiles[key] = PageProfile(temp_label, hum_label, fast)
+            self._count("learned")
+        return expected
+
+
+_shared_extractor = ReadingExtractor()
+
+
+def get_extractor():
+    """Return the process-wide ReadingExtractor."""
+    return _shared_extractor
@@ -0,0 +1,72 @@
+import hashlib
+import threading
+from metrics import FETCH_SKIPPED
+
+
+class _Entry:
+    __slots__ = ("etag", "last_modified", "digest", "values")
+
+    def __init__(self, etag, last_modified, digest, values):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.values = values
+
+
+class FetchCache:
+    """Per-device memory of the last page, so unchanged pages skip work.
+
+    Devices whose firmware sends ETag or Last-Modified get a conditional
+    request next time, and a 304 reuses the last readings without a body.
+    Otherwise the body is hashed; a byte-identical page reuses the last
+    parsed readings instead of running the extractor again.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def request_headers(self, key):
+        """Conditional request headers for a device, or None if it sent no validators."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers or None
+
+    def not_modified(self, key):
+        """Readings to use for a 304 response (None if nothing is cached)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        FETCH_SKIPPED.inc("not_modified")
+        return entry.values
+
+    def lookup(self, key, body):
+        """(digest, cached readings or None) for a page body."""
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        entry = self._entries.get(key)
+        if entry is not None and entry.digest == digest:
+            FETCH_SKIPPED.inc("same_body")
+            return digest, entry.values
+        return digest, None
+
+    def store(self, key, headers, digest, values):
+        with self._lock:
+            self._entries[key] = _Entry(headers.get("ETag"), headers.get("Last-Modified"), digest, values)
+
+    def forget(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+_shared_cache = FetchCache()
+
+
+def get_fetch_cache():
+    """Return the process-wide FetchCache."""
+    return _shared_cache
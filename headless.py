@@ -0,0 +1,171 @@
+"""Poll the hygrometers without the GUI and write readings as JSON lines or CSV.
+
+    python -m headless [--config ip_config.json] [--format jsonl|csv]
+                       [--output FILE] [--duration SECONDS] [--history]
+                       [--metrics-port PORT] [--serve-port PORT] [--debug]
+                       [--shards N|auto] [--shard-by subnet|location]
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import queue
+import sys
+import time
+from datetime import datetime
+import engine
+
+CONFIG_CHECK_INTERVAL = 2.0  # Seconds between checks for edits to the configuration file
+
+FIELDS = [
+    "timestamp", "id", "ip", "title", "barcode", "location",
+    "temperature", "humidity", "temp_alarm", "humidity_alarm", "state",
+]
+
+
+def make_record(ip_data, temperature, humidity, ts, state):
+    """One output row for a completed poll."""
+    return {
+        "timestamp": datetime.fromtimestamp(ts).isoformat(timespec="seconds"),
+        "id": ip_data['id'],
+        "ip": ip_data['ip'],
+        "title": ip_data.get('title'),
+        "barcode": ip_data.get('barcode'),
+        "location": ip_data.get('location'),
+        "temperature": temperature,
+        "humidity": humidity,
+        "temp_alarm": engine.out_of_range(temperature, ip_data.get('min_temp'), ip_data.get('max_temp')),
+        "humidity_alarm": engine.out_of_range(humidity, ip_data.get('min_humidity'), ip_data.get('max_humidity')),
+        "state": state,
+    }
+
+
+def open_writer(stream, fmt):
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, fieldnames=FIELDS)
+        # Appending to an existing file must not repeat the header mid-file
+        if os.fstat(stream.fileno()).st_size == 0:
+            writer.writeheader()
+        return writer.writerow
+    return lambda record: stream.write(json.dumps(record) + "\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m headless", description=__doc__.splitlines()[0])
+    parser.add_argument("--config", default=engine.CONFIG_FILE, help="device list (default: %(default)s)")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--output", default="-", help="file to append to, or - for stdout")
+    parser.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--interval", type=float, default=None, help="default poll interval in seconds")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="cap on concurrent requests")
+    parser.add_argument("--history", action="store_true", help="also record readings in the history store")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus metrics on this local port")
+    parser.add_argument("--serve-port", type=int, default=None,
+                        help="share readings over the live HTTP/WebSocket API on this port")
+    parser.add_argument("--serve-host", default="127.0.0.1", help="address for --serve-port (default: %(default)s)")
+    parser.add_argument("--shards", default=None,
+                        help="poll from this many worker processes (auto = one per CPU core)")
+    parser.add_argument("--shard-by", choices=("subnet", "location"), default="subnet",
+                        help="keep devices of the same subnet or location in one shard (default: %(default)s)")
+    parser.add_argument("--debug", action="store_true", help="log (rate-limited) per-response details to stderr")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Logging goes to stderr so it never mixes with the data stream
+    logging.basicConfig(level=logging.DEBUG if args.debug else logging.WARNING, stream=sys.stderr,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    stream = sys.stdout if args.output == "-" else open(args.output, "a", newline="")
+    write = open_writer(stream, args.format)
+
+    metrics_server = None
+    if args.metrics_port:
+        from metrics import MetricsServer
+        metrics_server = MetricsServer(args.metrics_port).start()
+
+    history = None
+    if args.history:
+        from history import HistoryStore
+        history = HistoryStore()
+
+    options = {}
+    if args.interval is not None:
+        options["default_interval"] = args.interval
+    if args.max_in_flight is not None:
+        options["max_in_flight"] = args.max_in_flight
+
+    from config_store import ConfigError, ConfigStore, apply_devices
+    from device_registry import DeviceRegistry
+    config_store = ConfigStore(args.config)
+    try:
+        config = config_store.load()
+    except (OSError, ConfigError) as e:
+        print(f"Could not load the device list: {e}", file=sys.stderr)
+        return 1
+    registry = DeviceRegistry(config.get("ips", []), next_id=config.get("next_id"))
+    if config_store.assigned_ids:
+        config_store.compact(registry.to_list(), registry.next_id)  # Keep the ids given to hand-added devices
+    live = api_server = None
+    if args.serve_port:
+        from live_api import LiveState, LiveApiServer
+        live = LiveState(registry)
+        api_server = LiveApiServer(live, args.serve_port, host=args.serve_host).start()
+
+    readings = queue.Queue()
+    if args.shards:
+        from sharding import ShardedPollingEngine
+        poller = ShardedPollingEngine(registry, lambda *reading: readings.put(reading), history=history,
+                                      shards=args.shards, shard_by=args.shard_by, **options)
+    else:
+        poller = engine.PollingEngine(registry, lambda *reading: readings.put(reading), history=history, **options)
+    poller.start()
+
+    deadline = None if args.duration is None else time.monotonic() + args.duration
+    next_config_check = time.monotonic() + CONFIG_CHECK_INTERVAL
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            # Apply edits to the configuration file without restarting
+            if time.monotonic() >= next_config_check:
+                next_config_check = time.monotonic() + CONFIG_CHECK_INTERVAL
+                if config_store.changed():
+                    try:
+                        if any(apply_devices(registry, config_store.load().get("ips", []))):
+                            poller.refresh()
+                        if config_store.assigned_ids:
+                            config_store.compact(registry.to_list(), registry.next_id)
+                    except (OSError, ConfigError) as e:
+                        logging.getLogger("dth").warning("Could not reload the device list: %s", e)
+            try:
+                ip_data, temperature, humidity, ts = readings.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            state, _ = poller.health.status(ip_data['id'])
+            if live is not None:
+                live.publish(ip_data, temperature, humidity, ts, state)
+            write(make_record(ip_data, temperature, humidity, ts, state))
+            stream.flush()
+    except KeyboardInterrupt:
+        pass
+    except BrokenPipeError:
+        # Reader went away (e.g. piped into head); silence the flush at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.__stdout__.fileno())
+    finally:
+        poller.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+        if api_server is not None:
+            api_server.stop()
+        if history is not None:
+            history.close()
+        if stream is not sys.__stdout__:
+            stream.close()
+    return 0
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
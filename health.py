@@ -0,0 +1,129 @@
+import random
+import threading
+import time
+
+# Device health states
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+DEFAULT_OPEN_AFTER = 3  # Consecutive failures before the circuit opens
+DEFAULT_BASE_BACKOFF = 5.0
+DEFAULT_MAX_BACKOFF = 300.0
+DEFAULT_BACKOFF_JITTER = 0.2  # +/- fraction of the backoff
+DEFAULT_PROBE_TIMEOUT = (1.0, 2.0)  # (connect, read) seconds for half-open probes
+
+
+class DeviceHealth:
+    """Circuit breaker for one device.
+
+    healthy -> degraded on the first failure, degraded -> open after
+    ``open_after`` failures in a row. While open the device is only retried
+    after an exponential backoff with jitter; that retry is a half-open probe
+    with short timeouts. A successful probe closes the circuit, a failed one
+    reopens it with twice the backoff.
+    """
+
+    def __init__(self, open_after=DEFAULT_OPEN_AFTER, base_backoff=DEFAULT_BASE_BACKOFF,
+                 max_backoff=DEFAULT_MAX_BACKOFF, jitter=DEFAULT_BACKOFF_JITTER):
+        self.open_after = open_after
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+
+        self.state = HEALTHY
+        self.failures = 0
+        self.backoff = 0.0
+        self.last_success = None  # Wall-clock time of the last good reading
+        self.last_error = None
+
+    def record_success(self):
+        self.state = HEALTHY
+        self.failures = 0
+        self.backoff = 0.0
+        self.last_success = time.time()
+        self.last_error = None
+
+    def record_failure(self, error=None):
+        self.failures += 1
+        self.last_error = error
+        if self.state == HALF_OPEN:
+            self.state = OPEN
+            self.backoff = min(self.max_backoff, self.backoff * 2)
+        elif self.failures >= self.open_after:
+            self.state = OPEN
+            self.backoff = self.base_backoff
+        else:
+            self.state = DEGRADED
+
+    def next_delay(self, interval):
+        """Seconds until the next poll: the normal interval, or the backoff while open."""
+        if self.state != OPEN:
+            return interval
+        return max(interval, self.backoff * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def begin_poll(self):
+        """Called as a poll starts; returns True if it is a half-open probe."""
+        if self.state == OPEN:
+            self.state = HALF_OPEN
+        return self.state == HALF_OPEN
+
+
+class HealthTracker:
+    """Thread-safe DeviceHealth per device id."""
+
+    def __init__(self, probe_timeout=DEFAULT_PROBE_TIMEOUT, **health_options):
+        self.probe_timeout = probe_timeout
+        self._health_options = health_options
+        self._devices = {}
+        self._lock = threading.Lock()
+
+    def _get(self, device_id):
+        health = self._devices.get(device_id)
+        if health is None:
+            health = self._devices[device_id] = DeviceHealth(**self._health_options)
+        return health
+
+    def record(self, device_id, ok, error=None):
+        with self._lock:
+            health = self._get(device_id)
+            if ok:
+                health.record_success()
+            else:
+                health.record_failure(error)
+
+    def next_delay(self, device_id, interval):
+        with self._lock:
+            return self._get(device_id).next_delay(interval)
+
+    def begin_poll(self, device_id):
+        """Start a poll; returns short probe timeouts for an open circuit, else None (client default)."""
+        with self._lock:
+            return self.probe_timeout if self._get(device_id).begin_poll() else None
+
+    def status(self, device_id):
+        """(state, last success wall time or None) for one device."""
+        with self._lock:
+            health = self._devices.get(device_id)
+            if health is None:
+                return HEALTHY, None
+            return health.state, health.last_success
+
+    def forget(self, device_id):
+        with self._lock:
+            self._devices.pop(device_id, None)
+
+
+def format_age(last_success, now=None):
+    """Short "time since last good reading" text for the table."""
+    if last_success is None:
+        return "never"
+    age = max(0, int((now or time.time()) - last_success))
+    if age < 60:
+        return f"{age} s ago"
+    if age < 3600:
+        return f"{age // 60} min ago"
+    if age < 86400:
+        return f"{age // 3600} h ago"
+    return f"{age // 86400} d ago"
@@ -0,0 +1,332 @@
+import os
+import threading
+import time
+import numpy as np
+
+# Directory holding one sub-directory of ring files per device
+HISTORY_DIR = "history"
+
+# One reading on disk: 20 bytes, missing values are stored as NaN
+RECORD_DTYPE = np.dtype([
+    ("ts", "<f8"),
+    ("temperature", "<f4"),
+    ("humidity", "<f4"),
+    ("status", "<u4"),
+])
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("record_size", "<u4"),
+    ("capacity", "<u8"),
+    ("total", "<u8"),
+])
+HEADER_SIZE = 64
+MAGIC = b"DHMRING1"
+VERSION = 1
+
+# Reading status flags (ORed together in the downsampled tiers)
+STATUS_OK = 0
+STATUS_NO_TEMPERATURE = 1
+STATUS_NO_HUMIDITY = 2
+STATUS_NO_DATA = STATUS_NO_TEMPERATURE | STATUS_NO_HUMIDITY
+
+# Tier name -> bucket width in seconds (0 = raw readings)
+TIERS = (("raw", 0), ("minute", 60), ("hour", 3600))
+
+DAY = 24 * 3600
+DEFAULT_RETENTION = {"raw": 7 * DAY, "minute": 90 * DAY, "hour": 5 * 365 * DAY}
+DEFAULT_RAW_RATE = 1.0  # Expected readings per second per device, used to size the raw ring
+
+
+class RingBuffer:
+    """Fixed-size ring of RECORD_DTYPE records in one memory-mapped file.
+
+    Appends write one record in place and bump the header counter, so they
+    are O(1) and survive a crash as soon as the OS flushes the page.
+    """
+
+    def __init__(self, path, capacity):
+        self.path = path
+        capacity = max(1, int(capacity))
+        if not os.path.exists(path):
+            self._create(path, capacity)
+        else:
+            header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+            if len(header) != 1 or header[0]["magic"] != MAGIC or header[0]["record_size"] != RECORD_DTYPE.itemsize:
+                raise ValueError(f"{path} is not a history ring file")
+            if int(header[0]["capacity"]) != capacity:
+                self._resize(path, capacity)
+
+        self._header = np.memmap(path, dtype=HEADER_DTYPE, mode="r+", offset=0, shape=(1,))
+        self.capacity = int(self._header[0]["capacity"])
+        self._records = np.memmap(path, dtype=RECORD_DTYPE, mode="r+", offset=HEADER_SIZE, shape=(self.capacity,))
+        self._total = int(self._header[0]["total"])
+        self._last_ts = float(self._records[(self._total - 1) % self.capacity]["ts"]) if self._total else 0.0
+
+    @staticmethod
+    def _create(path, capacity, records=None):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            header = np.zeros(1, dtype=HEADER_DTYPE)
+            header[0] = (MAGIC, VERSION, RECORD_DTYPE.itemsize, capacity, 0 if records is None else len(records))
+            f.write(header.tobytes().ljust(HEADER_SIZE, b"\0"))
+            if records is not None:
+                f.write(records.tobytes())
+            f.truncate(HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+        os.replace(tmp_path, path)
+
+    def _resize(self, path, capacity):
+        # Retention changed: keep the newest records that still fit
+        old = RingBuffer(path, int(np.fromfile(path, dtype=HEADER_DTYPE, count=1)[0]["capacity"]))
+        records = np.array(old.ordered()[-capacity:])
+        old.close()
+        self._create(path, capacity, records)
+
+    def __len__(self):
+        return min(self._total, self.capacity)
+
+    @property
+    def last_ts(self):
+        return self._last_ts
+
+    def append(self, ts, temperature, humidity, status):
+        # Keep timestamps monotonic so range queries can binary search
+        ts = max(ts, self._last_ts)
+        self._records[self._total % self.capacity] = (ts, temperature, humidity, status)
+        self._total += 1
+        self._header[0]["total"] = self._total
+        self._last_ts = ts
+
+    def _segments(self):
+        # Oldest-first views over the ring, without copying
+        if self._total <= self.capacity:
+            return (self._records[:self._total],)
+        head = self._total % self.capacity
+        return (self._records[head:], self._records[:head])
+
+    def ordered(self):
+        segments = self._segments()
+        return segments[0] if len(segments) == 1 else np.concatenate(segments)
+
+    def query(self, start=None, end=None):
+        """Return records with start <= ts < end as a NumPy structured array."""
+        parts = []
+        for segment in self._segments():
+            ts = segment["ts"]
+            lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+            hi = len(segment) if end is None else int(np.searchsorted(ts, end, side="left"))
+            if hi > lo:
+                parts.append(segment[lo:hi])
+        if not parts:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.array(parts[0]) if len(parts) == 1 else np.concatenate(parts)
+
+    def oldest_ts(self):
+        if not self._total:
+            return None
+        return float(self._segments()[0][0]["ts"])
+
+    def flush(self):
+        self._records.flush()
+        self._header.flush()
+
+    def close(self):
+        self.flush()
+        del self._records
+        del self._header
+
+
+class _Bucket:
+    """Running mean of the readings that fall into one downsampling interval."""
+
+    def __init__(self, start):
+        self.start = start
+        self.temp_sum = 0.0
+        self.temp_count = 0
+        self.hum_sum = 0.0
+        self.hum_count = 0
+        self.status = STATUS_OK
+
+    def add(self, temperature, humidity, status):
+        if temperature == temperature:  # Skip NaN
+            self.temp_sum += temperature
+            self.temp_count += 1
+        if humidity == humidity:
+            self.hum_sum += humidity
+            self.hum_count += 1
+        self.status |= status
+
+    def record(self):
+        temperature = self.temp_sum / self.temp_count if self.temp_count else np.nan
+        humidity = self.hum_sum / self.hum_count if self.hum_count else np.nan
+        return self.start, temperature, humidity, self.status
+
+
+class DeviceHistory:
+    """Raw, minute and hour rings for one device."""
+
+    def __init__(self, directory, capacities):
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.rings = {name: RingBuffer(os.path.join(directory, f"{name}.ring"), capacities[name]) for name, _ in TIERS}
+        self.buckets = {}
+
+        # Rebuild the open minute/hour buckets from raw data after a restart
+        raw = self.rings["raw"]
+        if len(raw):
+            for name, width in TIERS[1:]:
+                bucket = self.buckets[name] = _Bucket(raw.last_ts - raw.last_ts % width)
+                for rec in raw.query(bucket.start, None):
+                    bucket.add(float(rec["temperature"]), float(rec["humidity"]), int(rec["status"]))
+
+    def append(self, ts, temperature, humidity, status):
+        self.rings["raw"].append(ts, temperature, humidity, status)
+        for name, width in TIERS[1:]:
+            start = ts - ts % width
+            bucket = self.buckets.get(name)
+            if bucket is None or start > bucket.start:
+                if bucket is not None:
+                    self.rings[name].append(*bucket.record())
+                bucket = self.buckets[name] = _Bucket(start)
+            bucket.add(temperature, humidity, status)
+
+    def close(self):
+        for ring in self.rings.values():
+            ring.close()
+
+
+class HistoryStore:
+    """On-disk reading history: one set of memory-mapped ring buffers per device.
+
+    Each device keeps raw readings plus minute and hour averages. Ring sizes
+    come from the retention settings, so disk usage is fixed up front no matter
+    how long the app runs.
+    """
+
+    def __init__(self, root=HISTORY_DIR, retention=None, raw_rate=DEFAULT_RAW_RATE):
+        self.root = root
+        self.retention = dict(DEFAULT_RETENTION, **(retention or {}))
+        self.raw_rate = raw_rate
+        self.capacities = {
+            "raw": int(self.retention["raw"] * raw_rate),
+            "minute": int(self.retention["minute"] // 60),
+            "hour": int(self.retention["hour"] // 3600),
+        }
+        self._devices = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _device(self, device_id, create=True):
+        with self._lock:
+            history = self._devices.get(device_id)
+            if history is None:
+                directory = os.path.join(self.root, str(device_id))
+                if not create and not os.path.isdir(directory):
+                    return None
+                history = self._devices[device_id] = DeviceHistory(directory, self.capacities)
+            return history
+
+    def device_ids(self):
+        """Ids of every device that has history on disk."""
+        return sorted(int(name) for name in os.listdir(self.root) if name.isdigit())
+
+    def append(self, device_id, temperature, humidity, ts=None):
+        """Record one reading; None values are stored as NaN with a status flag."""
+        status = STATUS_OK
+        if temperature is None:
+            temperature = np.nan
+            status |= STATUS_NO_TEMPERATURE
+        if humidity is None:
+            humidity = np.nan
+            status |= STATUS_NO_HUMIDITY
+        history = self._device(device_id)
+        with history.lock:
+            history.append(time.time() if ts is None else ts, temperature, humidity, status)
+
+    def pick_tier(self, device_id, start):
+        """Finest tier that still holds data back to start.
+
+        When no tier reaches back that far (a store younger than the range),
+        the finest tier holding any data is used rather than a sparse coarse one.
+        """
+        history = self._device(device_id, create=False)
+        if history is None or start is None:
+            return "raw"
+        with history.lock:
+            oldest = {name: history.rings[name].oldest_ts() for name, _ in TIERS}
+        for name, _ in TIERS:
+            if oldest[name] is not None and oldest[name] <= start:
+                return name
+        for name, _ in TIERS:
+            if oldest[name] is not None:
+                return name
+        return "raw"
+
+    def coverage(self, device_id, start=None, end=None):
+        """(tier, lo, hi) segments covering start <= ts < end, oldest first, each from the finest tier
+        that holds that part of the range.
+
+        Raw readings are used as far back as they go. Before that, a coarser
+        tier contributes only buckets that end before the finer tier's first
+        record, so segments never overlap.
+        """
+        history = self._device(device_id, create=False)
+        if history is None:
+            return []
+        with history.lock:
+            spans = [(name, history.rings[name].oldest_ts(), history.rings[name].last_ts) for name, _ in TIERS]
+        segments = []
+        limit = None  # Where the finer tiers take over
+        for (name, oldest, newest), (_, width) in zip(spans, TIERS):
+            if oldest is None:
+                continue
+            if limit is not None:
+                limit -= limit % width
+            lo = oldest if start is None else max(start, oldest)
+            hi = np.nextafter(newest, np.inf) if limit is None else limit
+            hi = hi if end is None else min(hi, end)
+            if hi > lo:
+                segments.append((name, lo, hi))
+            if start is not None and oldest <= start:
+                break
+            limit = oldest
+        return segments[::-1]
+
+    def span(self, device_id, tier="raw"):
+        """(oldest ts, newest ts) held in one tier of a device, or None if it is empty."""
+        history = self._device(device_id, create=False)
+        if history is None:
+            return None
+        with history.lock:
+            ring = history.rings[tier]
+            oldest = ring.oldest_ts()
+            return None if oldest is None else (oldest, ring.last_ts)
+
+    def query(self, device_id, start=None, end=None, tier=None):
+        """Readings for one device with start <= ts < end as a structured NumPy array.
+
+        Fields are ts, temperature, humidity and status. tier is "raw",
+        "minute" or "hour"; by default the finest tier covering start is used.
+        """
+        history = self._device(device_id, create=False)
+        if history is None:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        tier = tier or self.pick_tier(device_id, start)
+        with history.lock:
+            return history.rings[tier].query(start, end)
+
+    def flush(self):
+        with self._lock:
+            devices = list(self._devices.values())
+        for history in devices:
+            with history.lock:
+                for ring in history.rings.values():
+                    ring.flush()
+
+    def close(self):
+        with self._lock:
+            devices = list(self._devices.values())
+            self._devices.clear()
+        for history in devices:
+            with history.lock:
+                history.close()
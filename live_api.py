@@ -0,0 +1,400 @@
+"""Share one poller's readings with any number of viewers.
+
+LiveApiServer serves the latest reading per device and a short in-memory
+history over HTTP/JSON, and pushes every new reading over a WebSocket:
+
+    GET /api/devices                 device list (ip_config.json entries)
+    GET /api/readings                latest reading per device
+    GET /api/history/<id>?seconds=N  recent readings of one device
+    GET /api/stream                  WebSocket: a snapshot, then one message per reading
+
+LiveFeedClient is the other end. It subscribes to /api/stream and calls back
+with every reading, so a viewer never polls the devices itself. Everything
+here is standard library only.
+"""
+import base64
+import collections
+import hashlib
+import json
+import logging
+import os
+import queue
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+DEFAULT_API_PORT = 8765
+DEFAULT_HISTORY_SIZE = 720  # Readings kept per device for /api/history
+SUBSCRIBER_QUEUE_SIZE = 1000  # A viewer further behind than this is dropped and must reconnect
+PING_INTERVAL = 15.0
+
+_WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_OP_TEXT, _OP_CLOSE, _OP_PING, _OP_PONG = 0x1, 0x8, 0x9, 0xA
+
+logger = logging.getLogger("dth.api")
+
+
+def make_reading(ip_data, temperature, humidity, ts, state=None):
+    return {
+        "id": ip_data['id'],
+        "ip": ip_data['ip'],
+        "title": ip_data.get('title'),
+        "temperature": temperature,
+        "humidity": humidity,
+        "ts": ts,
+        "state": state,
+    }
+
+
+def _encode_frame(opcode, payload, mask=False):
+    """One final WebSocket frame; clients must mask, servers must not."""
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    length = len(payload)
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack("!H", length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack("!Q", length)
+    if mask:
+        key = os.urandom(4)
+        payload = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+        header += key
+    return bytes(header) + payload
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) < size:
+        raise ConnectionError("connection closed")
+    return data
+
+
+def _read_frame(stream):
+    """(opcode, payload) of the next frame; fragmented messages are not used here."""
+    first, second = _read_exact(stream, 2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", _read_exact(stream, 2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", _read_exact(stream, 8))[0]
+    key = _read_exact(stream, 4) if second & 0x80 else None
+    payload = _read_exact(stream, length)
+    if key:
+        payload = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+    return first & 0x0F, payload
+
+
+def _accept_key(key):
+    return base64.b64encode(hashlib.sha1(key.encode() + _WS_GUID).digest()).decode()
+
+
+class LiveState:
+    """Latest reading and a short history per device, plus the live subscribers.
+
+    publish() is called from the poller threads. Each message is encoded into
+    a WebSocket frame once and the same bytes are queued for every subscriber.
+    """
+
+    def __init__(self, registry, history_size=DEFAULT_HISTORY_SIZE):
+        self.registry = registry
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._latest = {}
+        self._history = {}
+        self._subscribers = set()
+        self._devices = None
+        self._pruned = None
+
+    def _prune(self):
+        # Drop readings of devices removed from the registry; caller holds the lock
+        devices = self.registry.snapshot()
+        if devices is not self._pruned:
+            self._pruned = devices
+            ids = {device['id'] for device in devices}
+            for store in (self._latest, self._history):
+                for device_id in [device_id for device_id in store if device_id not in ids]:
+                    del store[device_id]
+
+    def publish(self, ip_data, temperature, humidity, ts, state=None):
+        reading = make_reading(ip_data, temperature, humidity, ts, state)
+        frames = []
+        with self._lock:
+            self._prune()
+            if reading['id'] not in self.registry:
+                return  # Deleted while it was being polled
+            self._latest[reading['id']] = reading
+            history = self._history.get(reading['id'])
+            if history is None:
+                history = self._history[reading['id']] = collections.deque(maxlen=self.history_size)
+            history.append((ts, temperature, humidity))
+            if not self._subscribers:
+                return
+            # Let viewers know when devices were added, edited or removed
+            devices = self.registry.snapshot()
+            if devices is not self._devices:
+                self._devices = devices
+                frames.append(self._frame({"type": "devices", "devices": [dict(device) for device in devices]}))
+            frames.append(self._frame({"type": "reading", "reading": reading}))
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                for frame in frames:
+                    subscriber.put_nowait(frame)
+            except queue.Full:
+                self.unsubscribe(subscriber)
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait(None)  # Wakes the sender so it closes the connection
+
+    def _frame(self, message):
+        return _encode_frame(_OP_TEXT, json.dumps(message).encode())
+
+    def devices(self):
+        return self.registry.to_list()
+
+    def readings(self):
+        with self._lock:
+            self._prune()
+            return list(self._latest.values())
+
+    def history(self, device_id, seconds=None):
+        with self._lock:
+            self._prune()
+            rows = list(self._history.get(device_id, ()))
+        if seconds is not None:
+            since = time.time() - seconds
+            rows = [row for row in rows if row[0] >= since]
+        return [{"ts": ts, "temperature": t, "humidity": h} for ts, t, h in rows]
+
+    def subscribe(self):
+        """A queue of encoded frames that starts with a full snapshot."""
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._prune()
+            devices = self.registry.snapshot()
+            self._devices = devices
+            subscriber.put(self._frame({
+                "type": "snapshot", "devices": [dict(device) for device in devices], "readings": list(self._latest.values()),
+            }))
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+class _ApiHandler(BaseHTTPRequestHandler):
+    state = None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        if parts == ["api", "stream"]:
+            self._stream()
+        elif parts == ["api", "devices"]:
+            self._json(self.state.devices())
+        elif parts == ["api", "readings"]:
+            self._json(self.state.readings())
+        elif len(parts) == 3 and parts[:2] == ["api", "history"] and parts[2].isdigit():
+            seconds = parse_qs(url.query).get("seconds")
+            try:
+                seconds = float(seconds[0]) if seconds else None
+            except ValueError:
+                self.send_error(400, "seconds must be a number")
+                return
+            self._json(self.state.history(int(parts[2]), seconds))
+        else:
+            self.send_error(404)
+
+    def _json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self):
+        key = self.headers.get("Sec-WebSocket-Key")
+        if self.headers.get("Upgrade", "").lower() != "websocket" or not key:
+            self.send_error(426, "WebSocket upgrade required")
+            return
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", _accept_key(key))
+        self.end_headers()
+        self.close_connection = True
+
+        subscriber = self.state.subscribe()
+        closed = threading.Event()
+        send_lock = threading.Lock()
+
+        def send(frame):
+            with send_lock:
+                self.wfile.write(frame)
+                self.wfile.flush()
+
+        def read_client():
+            # Answer pings and notice when the viewer goes away
+            try:
+                while True:
+                    opcode, payload = _read_frame(self.rfile)
+                    if opcode == _OP_PING:
+                        send(_encode_frame(_OP_PONG, payload))
+                    elif opcode == _OP_CLOSE:
+                        break
+            except (OSError, ValueError):
+                pass
+            closed.set()
+            subscriber.put(None)
+
+        threading.Thread(target=read_client, name="api-reader", daemon=True).start()
+        try:
+            while not closed.is_set():
+                try:
+                    frame = subscriber.get(timeout=PING_INTERVAL)
+                except queue.Empty:
+                    frame = _encode_frame(_OP_PING, b"")
+                if frame is None:
+                    break
+                send(frame)
+            send(_encode_frame(_OP_CLOSE, b""))
+        except OSError:
+            pass
+        finally:
+            self.state.unsubscribe(subscriber)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class LiveApiServer:
+    """Serve a LiveState over HTTP/JSON and WebSocket from background threads.
+
+    Binds to localhost by default; pass host="0.0.0.0" to let other PCs on the
+    network connect.
+    """
+
+    def __init__(self, state, port=DEFAULT_API_PORT, host="127.0.0.1"):
+        self.state = state
+        handler = type("ApiHandler", (_ApiHandler,), {"state": state})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="api-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class LiveFeedClient:
+    """Subscribe to another instance's /api/stream and reconnect when it drops.
+
+    on_devices(devices) is called with the device list on connect and whenever
+    it changes; on_reading(reading) with each reading dict. Both run on the
+    client's background thread.
+    """
+
+    def __init__(self, address, on_reading, on_devices=None, reconnect_delay=(1.0, 30.0)):
+        host, _, port = address.rpartition(":")
+        self.host = host or address
+        self.port = int(port) if host else DEFAULT_API_PORT
+        self.on_reading = on_reading
+        self.on_devices = on_devices
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+        self._stop = threading.Event()
+        self._sock = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="api-client", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        delay = self.reconnect_delay[0]
+        while not self._stop.is_set():
+            try:
+                self._listen()
+                delay = self.reconnect_delay[0]
+            except (OSError, ValueError) as e:
+                if self._stop.is_set():
+                    break
+                logger.warning("Live feed %s:%s unavailable: %s", self.host, self.port, e)
+            except Exception:
+                # A malformed message or a failing callback must not end the feed for good
+                if self._stop.is_set():
+                    break
+                logger.exception("Live feed %s:%s: error handling a message; reconnecting", self.host, self.port)
+            finally:
+                self.connected = False
+            if self._stop.wait(delay):
+                break
+            delay = min(delay * 2, self.reconnect_delay[1])
+
+    def _listen(self):
+        with socket.create_connection((self.host, self.port), timeout=10) as sock:
+            self._sock = sock
+            key = base64.b64encode(os.urandom(16)).decode()
+            sock.sendall((
+                f"GET /api/stream HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+            ).encode())
+            stream = sock.makefile("rb")
+            status = stream.readline().decode("latin-1")
+            while stream.readline() not in (b"\r\n", b"\n", b""):
+                pass  # Rest of the handshake headers
+            if " 101 " not in status:
+                raise ValueError(f"unexpected handshake reply {status.strip()!r}")
+            # The server pings every PING_INTERVAL, so a long silence means a dead link
+            sock.settimeout(PING_INTERVAL * 3)
+            self.connected = True
+            while not self._stop.is_set():
+                opcode, payload = _read_frame(stream)
+                if opcode == _OP_PING:
+                    sock.sendall(_encode_frame(_OP_PONG, payload, mask=True))
+                elif opcode == _OP_CLOSE:
+                    return
+                elif opcode == _OP_TEXT:
+                    self._dispatch(json.loads(payload))
+
+    def _dispatch(self, message):
+        kind = message.get("type")
+        if kind in ("snapshot", "devices") and self.on_devices is not None:
+            self.on_devices(message["devices"])
+        if kind == "snapshot":
+            for reading in message["readings"]:
+                self.on_reading(reading)
+        elif kind == "reading":
+            self.on_reading(message["reading"])
@@ -0,0 +1,268 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, from a fast LAN reply up to the read timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_METRICS_PORT = 9108
+
+
+def _label_text(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"'.replace("\n", " ") for name, value in zip(labelnames, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def remove(self, *labels):
+        with self._lock:
+            self._values.pop(tuple(labels), None)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = self.header()
+        for labels, value in self.values().items():
+            lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # [per-bucket counts..., +Inf count, sum]
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-1] += value
+
+    def totals(self):
+        """(count, sum, per-bucket counts) over all label sets."""
+        with self._lock:
+            states = [list(state) for state in self._values.values()]
+        counts = [sum(column) for column in zip(*[state[:-1] for state in states])] or [0] * (len(self.buckets) + 1)
+        return sum(counts), sum(state[-1] for state in states), counts
+
+    def quantile(self, fraction):
+        """Bucket upper bound below which `fraction` of all observations fall."""
+        count, _, counts = self.totals()
+        if not count:
+            return None
+        running = 0
+        for bound, n in zip(self.buckets + (float("inf"),), counts):
+            running += n
+            if running >= fraction * count:
+                return bound
+        return float("inf")
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = [(labels, list(state)) for labels, state in self._values.items()]
+        names = self.labelnames + ("le",)
+        for labels, state in items:
+            running = 0
+            for bound, n in zip(self.buckets + ("+Inf",), state[:-1]):
+                running += n
+                lines.append(f"{self.name}_bucket{_label_text(names, labels + (bound,))} {running}")
+            label_text = _label_text(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {state[-1]}")
+            lines.append(f"{self.name}_count{label_text} {running}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._add(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def add_collector(self, collect):
+        """collect() is called at scrape time and returns extra Gauges/Counters to render."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for collect in collectors:
+            for metric in collect():
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry and the hot-path metrics recorded by the poller and GUI
+METRICS = MetricsRegistry()
+FETCH_SECONDS = METRICS.histogram("dth_fetch_seconds", "Time to fetch one device page.", ("device",))
+PARSE_SECONDS = METRICS.histogram(
+    "dth_parse_seconds", "Time to extract readings from one page.",
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05),
+)
+QUEUE_WAIT_SECONDS = METRICS.histogram("dth_queue_wait_seconds", "Time a reading waited before the GUI applied it.")
+APPLY_SECONDS = METRICS.histogram(
+    "dth_gui_apply_seconds", "Time the GUI spent applying one drained batch.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+SWEEP_SECONDS = METRICS.histogram(
+    "dth_sweep_seconds", "Time for every device to be polled once.",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+ERRORS = METRICS.counter("dth_fetch_errors_total", "Failed polls by error type.", ("type",))
+READINGS = METRICS.counter("dth_readings_total", "Completed polls.")
+QUEUE_DEPTH = METRICS.gauge("dth_queue_depth", "Readings waiting for the GUI at the last drain.")
+MAILBOX_DROPPED = METRICS.counter(
+    "dth_mailbox_dropped_total", "Readings the GUI never applied, by reason.", ("reason",)
+)
+FETCH_SKIPPED = METRICS.counter(
+    "dth_unchanged_skipped_total",
+    "Work skipped because nothing changed: not_modified (304, no body), same_body (parse skipped), "
+    "same_value (not sent to the GUI).",
+    ("stage",),
+)
+
+
+def summary():
+    """A few headline numbers for the in-app stats panel."""
+    def ms(value):
+        return "n/a" if value is None else f"{value * 1000:.0f} ms"
+
+    errors = ", ".join(f"{labels[0]}: {count}" for labels, count in sorted(ERRORS.values().items())) or "none"
+    return "\n".join([
+        f"Readings: {READINGS.value()}",
+        f"Fetch p50 / p99: {ms(FETCH_SECONDS.quantile(0.5))} / {ms(FETCH_SECONDS.quantile(0.99))}",
+        f"Sweep p50: {ms(SWEEP_SECONDS.quantile(0.5))}",
+        f"Queue wait p99: {ms(QUEUE_WAIT_SECONDS.quantile(0.99))}",
+        f"GUI apply p99: {ms(APPLY_SECONDS.quantile(0.99))}",
+        f"Queue depth: {QUEUE_DEPTH.value()}",
+        f"Coalesced / dropped: {MAILBOX_DROPPED.value('coalesced')} / {MAILBOX_DROPPED.value('overflow')}",
+        f"Unchanged, skipped at 304 / same page / same value: {FETCH_SKIPPED.value('not_modified')} / "
+        f"{FETCH_SKIPPED.value('same_body')} / {FETCH_SKIPPED.value('same_value')}",
+        f"Errors: {errors}",
+    ])
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = METRICS
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes are not worth a log line each
+
+
+class MetricsServer:
+    """Serve GET /metrics on a local port from a background thread."""
+
+    def __init__(self, port=DEFAULT_METRICS_PORT, host="127.0.0.1", registry=METRICS):
+        handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class RateLimitedLogger:
+    """Log at most one message per key every `interval` seconds."""
+
+    def __init__(self, logger, interval=60.0):
+        self.logger = logger
+        self.interval = interval
+        self._last = {}
+        self._suppressed = {}
+        self._lock = threading.Lock()
+
+    def log(self, level, key, message, *args):
+        if not self.logger.isEnabledFor(level):
+            return  # Skip formatting entirely when the level is off
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < self.interval:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return
+            self._last[key] = now
+            suppressed = self._suppressed.pop(key, 0)
+        if suppressed:
+            message += f" ({suppressed} similar messages suppressed)"
+        self.logger.log(level, message, *args)
@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+from metrics import FETCH_SKIPPED, MAILBOX_DROPPED
+
+DEFAULT_MAILBOX_SIZE = 10000
+DEFAULT_REPEATS = 3
+
+
+class LatestValueMailbox:
+    """Hand readings from the poll workers to the GUI, keeping only the newest per device.
+
+    put() replaces any reading for the same key that the GUI has not picked
+    up yet, so a stalled GUI finds one reading per device however long it was
+    blocked. take_all() swaps the whole mailbox out as one batch. The mailbox
+    holds at most `maxsize` keys; past that the oldest entry is dropped.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAILBOX_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self.coalesced = 0
+        self.dropped = 0
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._items:
+                self.coalesced += 1
+                MAILBOX_DROPPED.inc("coalesced")
+            elif len(self._items) >= self.maxsize:
+                self._items.popitem(last=False)
+                self.dropped += 1
+                MAILBOX_DROPPED.inc("overflow")
+            self._items[key] = value
+
+    def take_all(self):
+        """Every pending value, oldest key first; the mailbox is left empty."""
+        with self._lock:
+            if not self._items:
+                return []
+            items, self._items = self._items, OrderedDict()
+        return list(items.values())
+
+    def discard(self, key):
+        """Forget the pending value for a key (e.g. a deleted device)."""
+        with self._lock:
+            if self._items.pop(key, None) is not None:
+                MAILBOX_DROPPED.inc("deleted")
+
+    def __len__(self):
+        return len(self._items)
+
+
+class RepeatFilter:
+    """Decide whether a reading is worth handing to the GUI at all.
+
+    A value equal to the key's previous one is let through `repeats` times
+    in a row, so N-of-M alarm debounce still sees a full window of it, and
+    skipped after that until it changes.
+    """
+
+    def __init__(self, repeats=DEFAULT_REPEATS):
+        self.repeats = repeats
+        self._lock = threading.Lock()
+        self._last = {}  # key -> [value, times in a row]
+        self.skipped = 0
+
+    def changed(self, key, value):
+        """True if value should be delivered."""
+        with self._lock:
+            last = self._last.get(key)
+            if last is None or last[0] != value:
+                self._last[key] = [value, 1]
+                return True
+            if last[1] >= self.repeats:
+                self.skipped += 1
+                FETCH_SKIPPED.inc("same_value")
+                return False
+            last[1] += 1
+            return True
+
+    def forget(self, key):
+        with self._lock:
+            self._last.pop(key, None)
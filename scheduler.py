@@ -0,0 +1,164 @@
+import heapq
+import logging
+import itertools
+import queue
+import random
+import threading
+import time
+
+# Default poll settings, used when a device entry in ip_config.json does not
+# carry its own "poll_interval" / "poll_jitter" (both in seconds)
+DEFAULT_POLL_INTERVAL = 1.0
+DEFAULT_POLL_JITTER = 0.2
+DEFAULT_MAX_IN_FLIGHT = 32
+
+logger = logging.getLogger("dth.scheduler")
+
+
+class PollScheduler:
+    """Poll many devices concurrently, each on its own interval.
+
+    A single dispatcher thread keeps a heap of (due time, device id) and hands
+    due devices to a fixed pool of worker threads. At most ``max_in_flight``
+    fetches run at once and a device is never fetched twice in parallel, so a
+    sweep takes roughly as long as the slowest device instead of the sum.
+    """
+
+    def __init__(self, get_devices, fetch, on_result,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 default_interval=DEFAULT_POLL_INTERVAL,
+                 default_jitter=DEFAULT_POLL_JITTER, next_delay=None):
+        # get_devices() -> list of device dicts (each with an 'id')
+        # fetch(ip_data) -> result, on_result(ip_data, result) -> None
+        # next_delay(ip_data, delay) -> delay lets callers stretch it (e.g. backoff)
+        self.get_devices = get_devices
+        self.fetch = fetch
+        self.on_result = on_result
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.default_interval = default_interval
+        self.default_jitter = default_jitter
+        self.next_delay = next_delay
+
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._devices = {}
+        self._scheduled = set()
+        self._in_flight = set()
+        self._jobs = queue.Queue()
+        self._source = None
+        self._source_len = -1
+        self._dirty = True
+        self._running = False
+        self._threads = []
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"poll-worker-{n}", daemon=True)
+            for n in range(self.max_in_flight)
+        ]
+        self._threads.append(threading.Thread(target=self._dispatch, name="poll-dispatcher", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, wait=False):
+        """Stop polling; with wait=True, return only once the fetches in progress have finished."""
+        with self._cond:
+            self._running = False
+            # Drop jobs no worker has picked up yet, so nothing new is fetched after this
+            while True:
+                try:
+                    ip_data = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if ip_data is not None:
+                    self._in_flight.discard(ip_data['id'])
+            self._cond.notify_all()
+        for _ in range(self.max_in_flight):
+            self._jobs.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def refresh(self):
+        """Re-read the device list on the next dispatcher pass (call after add/delete)."""
+        with self._cond:
+            self._dirty = True
+            self._cond.notify_all()
+
+    def interval_for(self, ip_data):
+        return float(ip_data.get('poll_interval') or self.default_interval)
+
+    def jitter_for(self, ip_data):
+        jitter = ip_data.get('poll_jitter')
+        return float(self.default_jitter if jitter is None else jitter)
+
+    def _push(self, due, device_id):
+        heapq.heappush(self._heap, (due, next(self._seq), device_id))
+        self._scheduled.add(device_id)
+
+    def _sync_devices(self):
+        # Only walk the device list when it was replaced, resized or flagged dirty
+        devices = self.get_devices()
+        if not self._dirty and devices is self._source and len(devices) == self._source_len:
+            return
+        self._dirty = False
+        self._source = devices
+        self._source_len = len(devices)
+        self._devices = {ip_data['id']: ip_data for ip_data in devices}
+
+        # New devices start within their jitter window so they don't all fire together
+        now = time.monotonic()
+        for device_id, ip_data in self._devices.items():
+            if device_id not in self._scheduled and device_id not in self._in_flight:
+                self._push(now + random.uniform(0, self.jitter_for(ip_data)), device_id)
+
+    def _dispatch(self):
+        with self._cond:
+            while self._running:
+                self._sync_devices()
+                now = time.monotonic()
+                while self._heap and self._heap[0][0] <= now and len(self._in_flight) < self.max_in_flight:
+                    _, _, device_id = heapq.heappop(self._heap)
+                    self._scheduled.discard(device_id)
+                    ip_data = self._devices.get(device_id)
+                    if ip_data is None:
+                        continue  # Device was removed while waiting
+                    self._in_flight.add(device_id)
+                    self._jobs.put(ip_data)
+
+                timeout = None
+                if self._heap and len(self._in_flight) < self.max_in_flight:
+                    timeout = max(0.0, self._heap[0][0] - now)
+                self._cond.wait(timeout)
+
+    def _worker(self):
+        while True:
+            ip_data = self._jobs.get()
+            if ip_data is None:
+                return
+            result = None
+            try:
+                result = self.fetch(ip_data)
+            except Exception:
+                logger.exception("Poll failed for %s", ip_data.get('ip'))
+            try:
+                self.on_result(ip_data, result)
+            except Exception:
+                logger.exception("Result handler failed for %s", ip_data.get('ip'))
+
+            # Reschedule relative to completion so slow devices don't pile up
+            delay = self.interval_for(ip_data) + random.uniform(-1, 1) * self.jitter_for(ip_data)
+            if self.next_delay is not None:
+                try:
+                    delay = self.next_delay(ip_data, delay)
+                except Exception:
+                    logger.exception("Delay hook failed for %s", ip_data.get('ip'))
+            with self._cond:
+                self._in_flight.discard(ip_data['id'])
+                if ip_data['id'] in self._devices:
+                    self._push(time.monotonic() + max(0.0, delay), ip_data['id'])
+                self._cond.notify_all()
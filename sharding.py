@@ -0,0 +1,288 @@
+"""Poll the fleet from several worker processes.
+
+The device list is split into shards, grouped by subnet (or by location),
+and each shard runs its own PollingEngine in a child process, so fetching
+and page parsing are spread over the CPU cores instead of sharing one GIL.
+Readings come back to the parent as packed binary batches over a pipe; the
+parent keeps the circuit-breaker state shown in the GUI, records history
+and calls on_reading exactly like PollingEngine. A shard that dies is
+started again after a short, growing delay.
+"""
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.connection import wait
+import numpy as np
+from health import HealthTracker
+from metrics import METRICS, READINGS
+
+# One reading in a batch (32 bytes); missing values are NaN
+READING_DTYPE = np.dtype([
+    ("id", "<u4"),
+    ("pad", "<u4"),
+    ("ts", "<f8"),
+    ("temperature", "<f8"),
+    ("humidity", "<f8"),
+])
+BATCH_INTERVAL = 0.05  # Seconds a shard collects readings before sending them
+RESTART_DELAY = 1.0  # First restart delay after a crash, doubled per crash up to RESTART_DELAY_MAX
+RESTART_DELAY_MAX = 30.0
+STABLE_AFTER = 60.0  # A shard that ran this long is considered healthy again
+SHARD_BY = ("subnet", "location")
+
+logger = logging.getLogger("dth")
+SHARD_RESTARTS = METRICS.counter("dth_shard_restarts_total", "Polling shards restarted after exiting.", ("shard",))
+
+
+# Function to pick the group a device is sharded with
+def shard_key(ip_data, by="subnet"):
+    """The device's /24 for "subnet" (its host name if not IPv4), its location for "location"."""
+    if by == "location":
+        return ip_data.get('location') or ""
+    host = ip_data['ip'].rsplit(":", 1)[0] if ip_data['ip'].count(":") == 1 else ip_data['ip']
+    parts = host.split(".")
+    return ".".join(parts[:3]) if len(parts) == 4 and all(part.isdigit() for part in parts) else host
+
+
+# Function to read a shard count setting ("auto" or empty = one per CPU core)
+def shard_count(value):
+    if value in (None, "", "auto", 0, "0"):
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
+def _shard_main(index, devices, control, data, options):
+    """Entry point of one shard process."""
+    from config_store import apply_devices
+    from device_registry import DeviceRegistry
+    from engine import PollingEngine
+
+    logging.basicConfig(level=logging.WARNING, format=f"%(asctime)s %(levelname)s shard {index}: %(message)s")
+    registry = DeviceRegistry(devices)
+    pending = []
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def on_reading(ip_data, temperature, humidity, ts):
+        with lock:
+            pending.append((ip_data['id'], 0, ts, math.nan if temperature is None else temperature,
+                            math.nan if humidity is None else humidity))
+
+    def follow_control():
+        # New device lists come from the parent; EOF means the parent is gone
+        try:
+            while True:
+                message = control.recv()
+                if message is None:
+                    break
+                apply_devices(registry, message)
+                engine.refresh()
+        except (EOFError, OSError):
+            pass
+        stop.set()
+
+    engine = PollingEngine(registry, on_reading, **options)
+    engine.start()
+    threading.Thread(target=follow_control, name="shard-control", daemon=True).start()
+    try:
+        while not stop.wait(BATCH_INTERVAL):
+            with lock:
+                batch, pending[:] = list(pending), []
+            if batch:
+                data.send_bytes(np.array(batch, dtype=READING_DTYPE).tobytes())
+    except (BrokenPipeError, EOFError, OSError):
+        pass
+    finally:
+        engine.stop()
+
+
+class _Shard:
+    def __init__(self, index):
+        self.index = index
+        self.devices = []
+        self.process = None
+        self.control = None
+        self.data = None
+        self.started = 0.0
+        self.restart_delay = RESTART_DELAY
+        self.restart_at = None
+
+
+class ShardedPollingEngine:
+    """Drop-in for PollingEngine that polls from `shards` worker processes.
+
+    Devices in the same group (see shard_key) share a shard where they can:
+    a group larger than an even share of the fleet is split into share-sized
+    parts, so one big subnet still uses every core. Parts keep their shard
+    when the device list changes and new ones go to the least loaded shard.
+    Shards without devices are not started. Fetch and parse timings stay in
+    the shard processes, so the parent's metrics only count readings and
+    shard restarts.
+    """
+
+    def __init__(self, registry, on_reading, history=None, health=None, shards=None, shard_by="subnet",
+                 **scheduler_options):
+        if shard_by not in SHARD_BY:
+            raise ValueError(f"shard_by must be one of {', '.join(SHARD_BY)}")
+        self.registry = registry
+        self.on_reading = on_reading
+        self.history = history
+        self.health = health or HealthTracker()
+        self.shard_by = shard_by
+        self.options = scheduler_options
+        self.shards = [_Shard(n) for n in range(shard_count(shards))]
+        self._groups = {}  # Group key -> shard index of each of its parts
+        self._lock = threading.Lock()
+        self._running = False
+        self._context = multiprocessing.get_context("spawn")  # No forking a process that runs Qt and threads
+
+    def start(self):
+        with self._lock:
+            self._running = True
+            self._assign()
+            for shard in self.shards:
+                if shard.devices:
+                    self._spawn(shard)
+        threading.Thread(target=self._receive, name="shard-receiver", daemon=True).start()
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+            shards = list(self.shards)
+        for shard in shards:
+            try:
+                shard.control.send(None)
+            except (OSError, AttributeError):
+                pass  # Never started, or already exited
+        for shard in shards:
+            if shard.process is not None:
+                shard.process.join(timeout=2)
+                if shard.process.is_alive():
+                    shard.process.terminate()
+
+    def refresh(self):
+        """Pick up devices added to or removed from the registry."""
+        with self._lock:
+            changed = self._assign()
+            for shard in changed:
+                if shard.process is None:
+                    if shard.devices and shard.restart_at is None:
+                        self._spawn(shard)  # Idle until now; a crashed shard waits for its restart instead
+                    continue
+                try:
+                    # An empty list would leave the process idle, so it is told to exit instead
+                    shard.control.send(shard.devices or None)
+                except OSError:
+                    pass  # The shard is exiting; it gets the new list when restarted
+
+    def _assign(self):
+        # Returns the shards whose device list changed
+        groups = {}
+        for ip_data in self.registry.snapshot():
+            groups.setdefault(shard_key(ip_data, self.shard_by), []).append(dict(ip_data))
+        share = max(1, math.ceil(sum(len(devices) for devices in groups.values()) / len(self.shards)))
+        parts = {}
+        for key, devices in groups.items():
+            devices.sort(key=lambda ip_data: ip_data['id'])
+            parts[key] = [devices[i:i + share] for i in range(0, len(devices), share)]
+
+        placed = {key: self._groups.get(key, [])[:len(parts[key])] for key in parts}
+        load = [0] * len(self.shards)
+        for key, indices in placed.items():
+            for index, part in zip(indices, parts[key]):
+                load[index] += len(part)
+        for key in sorted(parts, key=lambda key: -len(groups[key])):
+            for part in parts[key][len(placed[key]):]:
+                index = load.index(min(load))
+                placed[key].append(index)
+                load[index] += len(part)
+        self._groups = placed
+
+        changed = []
+        for shard in self.shards:
+            devices = [ip_data for key, indices in placed.items() for index, part in zip(indices, parts[key])
+                       if index == shard.index for ip_data in part]
+            if devices != shard.devices:
+                shard.devices = devices
+                changed.append(shard)
+        return changed
+
+    def _spawn(self, shard):
+        control_receiver, control_sender = self._context.Pipe(duplex=False)
+        data_receiver, data_sender = self._context.Pipe(duplex=False)
+        shard.process = self._context.Process(
+            target=_shard_main, args=(shard.index, shard.devices, control_receiver, data_sender, self.options),
+            name=f"dth-shard-{shard.index}", daemon=True,
+        )
+        shard.process.start()
+        control_receiver.close()
+        data_sender.close()
+        shard.control = control_sender
+        shard.data = data_receiver
+        shard.started = time.monotonic()
+        shard.restart_at = None
+
+    def _receive(self):
+        while True:
+            with self._lock:
+                if not self._running:
+                    return
+                self._restart_due()
+                connections = {shard.data: shard for shard in self.shards if shard.process is not None}
+            if not connections:
+                time.sleep(0.1)  # Every shard is idle or waiting to be restarted
+                continue
+            for connection in wait(list(connections), timeout=0.5):
+                shard = connections[connection]
+                try:
+                    batch = np.frombuffer(connection.recv_bytes(), dtype=READING_DTYPE)
+                except (EOFError, OSError):
+                    self._shard_exited(shard)
+                    continue
+                self._deliver(batch)
+
+    def _deliver(self, batch):
+        READINGS.inc(amount=len(batch))
+        for device_id, ts, temperature, humidity in zip(
+            batch["id"].tolist(), batch["ts"].tolist(), batch["temperature"].tolist(), batch["humidity"].tolist()
+        ):
+            ip_data = self.registry.get(device_id)
+            if ip_data is None:
+                continue  # Deleted since the shard polled it
+            temperature = None if math.isnan(temperature) else temperature
+            humidity = None if math.isnan(humidity) else humidity
+            self.health.record(device_id, temperature is not None or humidity is not None)
+            if self.history is not None:
+                self.history.append(device_id, temperature, humidity, ts=ts)
+            self.on_reading(ip_data, temperature, humidity, ts)
+
+    def _shard_exited(self, shard):
+        with self._lock:
+            if not self._running:
+                return
+            shard.process.join(timeout=1)
+            shard.data.close()
+            shard.control.close()
+            exitcode = shard.process.exitcode
+            shard.process = None
+            if not shard.devices:
+                return  # Told to exit because its devices went elsewhere; started again when it gets some
+            if time.monotonic() - shard.started > STABLE_AFTER:
+                shard.restart_delay = RESTART_DELAY
+            logger.warning("Polling shard %d exited (code %s); restarting in %.0f s",
+                           shard.index, exitcode, shard.restart_delay)
+            SHARD_RESTARTS.inc(str(shard.index))
+            shard.restart_at = time.monotonic() + shard.restart_delay
+            shard.restart_delay = min(shard.restart_delay * 2, RESTART_DELAY_MAX)
+
+    def _restart_due(self):
+        now = time.monotonic()
+        for shard in self.shards:
+            if shard.restart_at is not None and now >= shard.restart_at:
+                if shard.devices:
+                    self._spawn(shard)
+                else:
+                    shard.restart_at = None
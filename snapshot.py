@@ -0,0 +1,35 @@
+"""Last readings saved between runs, so the table can be filled before the first poll.
+
+The file holds the table rows in display order, each as
+[id, ip, temperature, humidity, reading time]; values are shown marked as
+stale until a fresh reading for the device arrives.
+"""
+import json
+import logging
+import time
+from config_store import write_atomic
+
+SNAPSHOT_FILE = "last_readings.json"
+SNAPSHOT_INTERVAL = 60  # Seconds between saves while running
+VERSION = 1
+
+
+# Function to save the table rows as [id, ip, temperature, humidity, ts] lists
+def save_snapshot(rows, path=SNAPSHOT_FILE):
+    write_atomic(path, json.dumps({"version": VERSION, "saved": time.time(), "rows": rows},
+                                  separators=(",", ":")))
+
+
+# Function to load the saved rows; a missing or unreadable snapshot just means a cold start
+def load_snapshot(path=SNAPSHOT_FILE):
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        logging.getLogger("dth").warning("Ignoring snapshot %s: %s", path, e)
+        return []
+    if not isinstance(snapshot, dict) or snapshot.get("version") != VERSION:
+        return []
+    return [row for row in snapshot.get("rows", []) if isinstance(row, list) and len(row) == 5]
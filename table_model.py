@@ -0,0 +1,243 @@
+from array import array
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
+from PyQt5.QtGui import QBrush, QColor
+
+COLUMNS = [
+    "", "DHM No", "Barcode No", "Location", "Temperature (°C)", "Humidity (%)",
+    "Min/Max Temp (°C)", "Min/Max Humidity (%)", "Status", "Last OK"
+]
+ID_COLUMN = 0
+TEMPERATURE_COLUMN = 4
+HUMIDITY_COLUMN = 5
+STATUS_COLUMN = 8
+LAST_OK_COLUMN = 9
+
+# Cell states for the reading columns
+STATE_NONE = 0
+STATE_OK = 1
+STATE_ALARM = 2
+STATE_STALE = 3  # Value restored from the last run's snapshot, not yet re-read
+
+# Brushes are created once and shared by every cell
+_BACKGROUND = {
+    STATE_OK: QBrush(QColor("green")), STATE_ALARM: QBrush(QColor("red")), STATE_STALE: QBrush(QColor("#d9d9d9")),
+}
+_FOREGROUND = {
+    STATE_OK: QBrush(QColor("white")), STATE_ALARM: QBrush(QColor("white")), STATE_STALE: QBrush(QColor("#707070")),
+}
+_HEALTH_FOREGROUND = {
+    "stale": QBrush(QColor("gray")),
+    "healthy": QBrush(QColor("green")),
+    "degraded": QBrush(QColor("darkorange")),
+    "half-open": QBrush(QColor("darkorange")),
+    "open": QBrush(QColor("red")),
+}
+NAN = float("nan")
+
+
+def _limit_text(low, high):
+    return f"{low if low else 'N/A'} / {high if high else 'N/A'}"
+
+
+def _value_state(value, alarm, stale=False):
+    if value is None:
+        return STATE_NONE
+    if stale:
+        return STATE_STALE
+    return STATE_ALARM if alarm else STATE_OK
+
+
+class ReadingTableModel(QAbstractTableModel):
+    """Table of the latest reading per device.
+
+    Readings live in flat arrays and each row's display strings are formatted
+    once when its values change. apply_batch() takes everything drained from
+    the worker in one go and emits a single dataChanged per run of changed rows.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._ids = []
+        self._ips = []
+        self._readings = []  # Last reading tuple per row, to skip unchanged ones cheaply
+        self._text = []  # Per-row list of formatted cell strings
+        self._temperature = array("d")
+        self._humidity = array("d")
+        self._states = []  # Per-row [temperature state, humidity state]
+        self._health = []  # Per-row [state, last success text]
+        self._stale = []  # Per-row snapshot reading time while the row still shows restored values, else None
+        self._row_by_ip = {}
+        self._row_by_id = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._ids)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return QVariant()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        row, column = index.row(), index.column()
+        if column >= STATUS_COLUMN:
+            if role == Qt.DisplayRole:
+                return self._health[row][column - STATUS_COLUMN]
+            if role == Qt.ForegroundRole and column == STATUS_COLUMN:
+                return _HEALTH_FOREGROUND.get(self._health[row][0], QVariant())
+            return QVariant()
+        if role == Qt.DisplayRole:
+            return self._text[row][column]
+        if column in (TEMPERATURE_COLUMN, HUMIDITY_COLUMN):
+            state = self._states[row][column - TEMPERATURE_COLUMN]
+            if state != STATE_NONE:
+                if role == Qt.BackgroundRole:
+                    return _BACKGROUND[state]
+                if role == Qt.ForegroundRole:
+                    return _FOREGROUND[state]
+        return QVariant()
+
+    def row_for_id(self, device_id):
+        return self._row_by_id.get(device_id)
+
+    def row_for_ip(self, ip):
+        return self._row_by_ip.get(ip)
+
+    def device_id(self, row):
+        return self._ids[row]
+
+    def ip(self, row):
+        return self._ips[row]
+
+    def stale_since(self, device_id):
+        """Reading time of the restored value a row still shows, or None once it has a fresh reading."""
+        row = self._row_by_id.get(device_id)
+        return None if row is None else self._stale[row]
+
+    def snapshot_rows(self, times):
+        """Rows in display order as [id, ip, temperature, humidity, reading time] for save_snapshot."""
+        rows = []
+        for row, device_id in enumerate(self._ids):
+            ts = self._stale[row] if self._stale[row] is not None else times.get(device_id)
+            if ts is None:
+                continue
+            temperature, humidity = self._temperature[row], self._humidity[row]
+            rows.append([device_id, self._ips[row], None if temperature != temperature else temperature,
+                         None if humidity != humidity else humidity, ts])
+        return rows
+
+    def _format(self, reading):
+        (device_id, _, title, barcode, location, temperature, humidity,
+         min_temp, max_temp, min_humidity, max_humidity, _, _) = reading
+        return [
+            str(device_id), title, barcode, location,
+            f"{temperature:.1f} °C" if temperature is not None else "N/A",
+            f"{humidity:.1f} %" if humidity is not None else "N/A",
+            _limit_text(min_temp, max_temp),
+            _limit_text(min_humidity, max_humidity),
+        ]
+
+    def apply_batch(self, readings, stale_since=None):
+        """Apply a batch of readings and return the number of rows inserted.
+
+        Each reading is (id, ip, title, barcode, location, temperature, humidity,
+        min_temp, max_temp, min_humidity, max_humidity, temperature alarm,
+        humidity alarm); later readings for the same ip win. The alarm flags
+        come from the AlarmEngine, so cells only change colour on transitions.
+        stale_since maps device ids to reading times for values restored from
+        the snapshot; those are greyed out until a fresh reading replaces them.
+        """
+        stale_since = stale_since or {}
+        latest = {}
+        for reading in readings:
+            latest[reading[1]] = reading
+
+        changed = []
+        new = []
+        for ip, reading in latest.items():
+            row = self._row_by_ip.get(ip)
+            if row is None:
+                new.append(reading)
+                continue
+            stale = stale_since.get(reading[0])
+            if reading == self._readings[row] and stale == self._stale[row]:
+                continue
+            self._readings[row] = reading
+            text = self._format(reading)
+            states = [_value_state(reading[5], reading[11], stale is not None),
+                      _value_state(reading[6], reading[12], stale is not None)]
+            if text != self._text[row] or states != self._states[row] or stale != self._stale[row]:
+                self._text[row] = text
+                self._states[row] = states
+                self._stale[row] = stale
+                self._temperature[row] = NAN if reading[5] is None else reading[5]
+                self._humidity[row] = NAN if reading[6] is None else reading[6]
+                changed.append(row)
+
+        if new:
+            first = len(self._ids)
+            self.beginInsertRows(QModelIndex(), first, first + len(new) - 1)
+            for reading in new:
+                self._row_by_ip[reading[1]] = len(self._ids)
+                self._row_by_id[reading[0]] = len(self._ids)
+                self._health.append(["", ""])
+                stale = stale_since.get(reading[0])
+                self._stale.append(stale)
+                self._ids.append(reading[0])
+                self._ips.append(reading[1])
+                self._readings.append(reading)
+                self._text.append(self._format(reading))
+                self._states.append([_value_state(reading[5], reading[11], stale is not None),
+                                     _value_state(reading[6], reading[12], stale is not None)])
+                self._temperature.append(NAN if reading[5] is None else reading[5])
+                self._humidity.append(NAN if reading[6] is None else reading[6])
+            self.endInsertRows()
+
+        self._emit_changed(changed, 0, STATUS_COLUMN - 1)
+        return len(new)
+
+    def set_health(self, statuses):
+        """Update the Status / Last OK columns from {device id: (state, last success text)}."""
+        changed = []
+        for device_id, status in statuses.items():
+            row = self._row_by_id.get(device_id)
+            if row is not None and self._health[row] != list(status):
+                self._health[row] = list(status)
+                changed.append(row)
+        self._emit_changed(changed, STATUS_COLUMN, LAST_OK_COLUMN)
+
+    def _emit_changed(self, rows, first_column, last_column):
+        # One dataChanged per contiguous run of changed rows
+        rows.sort()
+        start = None
+        for i, row in enumerate(rows):
+            if start is None:
+                start = row
+            if i + 1 == len(rows) or rows[i + 1] != row + 1:
+                self.dataChanged.emit(self.index(start, first_column), self.index(row, last_column))
+                start = None
+
+    def remove_row(self, row):
+        """Remove one row; only rows below it are renumbered."""
+        ip = self._ips[row]
+        device_id = self._ids[row]
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._ids[row]
+        del self._health[row]
+        del self._stale[row]
+        del self._row_by_id[device_id]
+        del self._ips[row]
+        del self._readings[row]
+        del self._text[row]
+        del self._states[row]
+        del self._temperature[row]
+        del self._humidity[row]
+        del self._row_by_ip[ip]
+        for shifted_ip, shifted_id in zip(self._ips[row:], self._ids[row:]):
+            self._row_by_ip[shifted_ip] -= 1
+            self._row_by_id[shifted_id] -= 1
+        self.endRemoveRows()
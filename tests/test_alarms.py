@@ -0,0 +1,47 @@
+import pytest
+from alarms import AlarmEngine
+
+DEVICE = {"id": 1, "min_temp": 15.0, "max_temp": 25.0, "min_humidity": None, "max_humidity": None}
+
+
+def run(engine, values):
+    """Active state of device 1's temperature alarm after each reading."""
+    states = []
+    for n, value in enumerate(values):
+        engine.evaluate([1], [value], [None], timestamps=[1000.0 + n])
+        states.append(engine.is_active(1, "temperature"))
+    return states
+
+
+def make_engine(debounce):
+    engine = AlarmEngine(debounce=debounce, log_path=None)
+    engine.sync([DEVICE])
+    return engine
+
+
+@pytest.mark.parametrize("debounce", [(1, 1), (1, 3), (2, 3), (2, 5), (3, 8), (8, 8)])
+def test_steady_out_of_range_value_stays_raised(debounce):
+    need, _ = debounce
+    states = run(make_engine(debounce), [30.0] * 20)
+    assert states == [False] * (need - 1) + [True] * (20 - need + 1)
+
+
+@pytest.mark.parametrize("debounce", [(1, 1), (1, 3), (2, 3), (2, 5), (3, 8), (8, 8)])
+def test_steady_value_back_in_range_stays_cleared(debounce):
+    need, _ = debounce
+    states = run(make_engine(debounce), [30.0] * 10 + [20.0] * 20)
+    assert states[10:] == [True] * (need - 1) + [False] * (20 - need + 1)
+
+
+@pytest.mark.parametrize("debounce", [(1, 3), (2, 3), (2, 5), (3, 8)])
+def test_one_transition_per_excursion(debounce):
+    engine = make_engine(debounce)
+    events = []
+    for n, value in enumerate([30.0] * 12 + [20.0] * 12 + [30.0] * 12):
+        events += engine.evaluate([1], [value], [None], timestamps=[1000.0 + n])
+    assert [event.active for event in events] == [True, False, True]
+
+
+def test_hysteresis_holds_alarm_near_the_limit():
+    states = run(make_engine((1, 1)), [26.0, 24.8, 24.4])
+    assert states == [True, True, False]
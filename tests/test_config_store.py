@@ -0,0 +1,71 @@
+import json
+import pytest
+from config_store import ConfigError, ConfigStore, apply_devices
+from device_registry import DeviceRegistry
+
+
+def write_config(tmp_path, config):
+    path = tmp_path / "ip_config.json"
+    path.write_text(json.dumps(config))
+    return ConfigStore(str(path))
+
+
+def test_entries_without_an_id_get_the_next_ones(tmp_path):
+    store = write_config(tmp_path, {"ips": [{"id": 1, "ip": "10.0.0.1"}, {"ip": "10.0.0.2"}, {"ip": "10.0.0.3"}],
+                                    "next_id": 5})
+    config = store.load()
+    assert [(device['id'], device['ip']) for device in config["ips"]] == [(1, "10.0.0.1"), (5, "10.0.0.2"),
+                                                                          (6, "10.0.0.3")]
+    assert config["next_id"] == 7
+    assert store.assigned_ids == [5, 6]
+
+
+def test_ids_start_at_one_without_a_counter(tmp_path):
+    store = write_config(tmp_path, {"ips": [{"ip": "10.0.0.1"}]})
+    assert store.load()["ips"][0]['id'] == 1
+
+
+def test_invalid_entries_are_skipped(tmp_path):
+    store = write_config(tmp_path, {"ips": [
+        {"id": 1, "ip": "10.0.0.1"},
+        "10.0.0.9",
+        {"id": 2},
+        {"id": 1, "ip": "10.0.0.3"},  # Reused id
+        {"id": "x", "ip": "10.0.0.4"},
+        {"ip": "10.0.0.1"},  # IP already listed
+    ]})
+    config = store.load()
+    assert [device['ip'] for device in config["ips"]] == ["10.0.0.1"]
+    assert store.assigned_ids == []
+
+
+def test_reload_with_a_hand_added_device_updates_the_registry(tmp_path):
+    store = write_config(tmp_path, {"ips": [{"id": 1, "ip": "10.0.0.1"}], "next_id": 2})
+    config = store.load()
+    registry = DeviceRegistry(config["ips"], next_id=config["next_id"])
+    (tmp_path / "ip_config.json").write_text(json.dumps({"ips": [{"id": 1, "ip": "10.0.0.1"}, {"ip": "10.0.0.2"}],
+                                                         "next_id": 2}))
+    added, removed, _ = apply_devices(registry, store.load()["ips"])
+    assert added == [2] and removed == []
+    assert registry.by_ip("10.0.0.2")['id'] == 2
+
+
+@pytest.mark.parametrize("text", ["{not json", "[]", '{"ips": {"ip": "10.0.0.1"}}'])
+def test_malformed_file_raises_config_error(tmp_path, text):
+    path = tmp_path / "ip_config.json"
+    path.write_text(text)
+    with pytest.raises(ConfigError):
+        ConfigStore(str(path)).load()
+
+
+def test_edits_after_a_torn_journal_line_are_kept(tmp_path):
+    store = write_config(tmp_path, {"ips": [], "next_id": 1})
+    store.load()
+    store.record_add({"id": 1, "ip": "10.0.0.1"}, 2)
+    with open(store.journal_path, "a") as f:
+        f.write('{"op": "add", "dev')  # Crash mid-append
+    store.load()
+    store.record_add({"id": 2, "ip": "10.0.0.2"}, 3)
+    config = ConfigStore(store.path).load()
+    assert [device['id'] for device in config["ips"]] == [1, 2]
+    assert config["next_id"] == 3
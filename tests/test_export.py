@@ -0,0 +1,70 @@
+import csv
+import numpy as np
+from export import ExportJob, iter_chunks
+from history import HistoryStore
+
+DEVICE = {"id": 1, "ip": "10.0.0.1", "title": "DHM-1", "barcode": "", "location": "Lab"}
+T0 = 1_749_999_600.0  # Start of the fake recording, aligned to the hour
+HOURS = 10
+
+
+def make_store(tmp_path):
+    # One reading every 10 s for 10 h; the raw ring keeps only the last hour
+    store = HistoryStore(str(tmp_path / "history"), retention={"raw": 3600}, raw_rate=0.1)
+    for n in range(HOURS * 360):
+        store.append(1, 20.0 + n % 7, 50.0, ts=T0 + n * 10)
+    return store
+
+
+def export_rows(store, **kwargs):
+    rows = []
+    for _, columns in iter_chunks(store, [DEVICE], **kwargs):
+        times = columns["interval_start" if kwargs.get("interval") else "ts"]
+        rows += [(columns["tier"], float(t)) for t in times]
+    return rows
+
+
+def test_start_before_first_reading_exports_every_tier(tmp_path):
+    store = make_store(tmp_path)
+    rows = export_rows(store, start=T0 - 86400)
+    times = [t for _, t in rows]
+    assert times == sorted(times) and len(set(times)) == len(times)  # In order, no overlap
+    assert times[0] == T0  # Not just the raw hour
+    tiers = [tier for tier, _ in rows]
+    assert set(tiers) == {"minute", "raw"}
+    assert tiers.count("raw") == len(store.query(1, tier="raw"))
+    # Minute means stop where raw readings start
+    last_minute = max(t for tier, t in rows if tier == "minute")
+    assert last_minute + 60 <= min(t for tier, t in rows if tier == "raw")
+    store.close()
+
+
+def test_recent_part_of_a_long_range_stays_raw(tmp_path):
+    store = make_store(tmp_path)
+    rows = export_rows(store, start=T0 + 3600)
+    raw = [t for tier, t in rows if tier == "raw"]
+    assert len(raw) == 360  # The whole last hour at full resolution
+    assert all(tier == "minute" for tier, t in rows if t < raw[0])
+    store.close()
+
+
+def test_explicit_tier_is_used_for_the_whole_range(tmp_path):
+    store = make_store(tmp_path)
+    rows = export_rows(store, tier="hour")
+    assert {tier for tier, _ in rows} == {"hour"}
+    assert len(rows) == HOURS - 1  # The open hour bucket is not written yet
+    store.close()
+
+
+def test_csv_has_a_tier_column(tmp_path):
+    store = make_store(tmp_path)
+    path = str(tmp_path / "out.csv")
+    job = ExportJob(store, [DEVICE], path, interval=3600)
+    job.run()
+    assert job.error is None
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    assert rows and rows[-1]["tier"] == "raw" and rows[0]["tier"] == "minute"
+    assert int(rows[-1]["samples"]) == 360
+    assert np.isclose(float(rows[-1]["temperature_max"]), 26.0)  # From raw readings, not means
+    store.close()
@@ -0,0 +1,139 @@
+import numpy as np
+
+# Points per bucket from one pyramid level to the next
+BLOCK = 4
+_INITIAL_CAPACITY = 1024
+
+
+def lttb_buckets(x, y, left, right):
+    """Pick one point per bucket with Largest-Triangle-Three-Buckets.
+
+    x and y are (buckets, points) arrays; left and right are (buckets, 2)
+    anchor points on either side. Returns the chosen (x, y) per bucket, the
+    point that spans the largest triangle with the anchors. Missing (NaN)
+    values are only chosen when a bucket has nothing else, so gaps survive.
+    """
+    ax, ay = left[:, :1], left[:, 1:]
+    cx, cy = right[:, :1], right[:, 1:]
+    with np.errstate(invalid="ignore"):
+        area = np.abs((ax - cx) * (y - ay) - (ax - x) * (cy - ay))
+    area = np.where(np.isnan(y), -1.0, np.where(np.isnan(area), 0.0, area))
+    pick = np.argmax(area, axis=1)
+    rows = np.arange(len(x))
+    return x[rows, pick], y[rows, pick]
+
+
+class _Level:
+    """A growable pair of x/y arrays."""
+
+    def __init__(self):
+        self.x = np.empty(_INITIAL_CAPACITY)
+        self.y = np.empty(_INITIAL_CAPACITY)
+        self.n = 0
+        self.reduced = 0  # Points already folded into the next level
+
+    def extend(self, x, y):
+        needed = self.n + len(x)
+        if needed > len(self.x):
+            capacity = max(needed, 2 * len(self.x))
+            for name in ("x", "y"):
+                grown = np.empty(capacity)
+                grown[:self.n] = getattr(self, name)[:self.n]
+                setattr(self, name, grown)
+        self.x[self.n:needed] = x
+        self.y[self.n:needed] = y
+        self.n = needed
+
+
+class TrendPyramid:
+    """A time series kept at several zoom levels for fast redraws.
+
+    Level 0 holds every point; each level above keeps one point per BLOCK
+    points of the level below, chosen with LTTB. Buckets are fixed, so new
+    points are folded in as they arrive without touching older buckets.
+    The left anchor of each bucket is the mean of the previous bucket rather
+    than the point picked there, which lets a whole batch of buckets be
+    reduced with array operations.
+    """
+
+    def __init__(self):
+        self.levels = [_Level()]
+
+    def __len__(self):
+        return self.levels[0].n
+
+    @property
+    def last_x(self):
+        level = self.levels[0]
+        return level.x[level.n - 1] if level.n else None
+
+    def extend(self, x, y):
+        """Append points (x must not go backwards)."""
+        x = np.asarray(x, dtype=np.float64)
+        if not len(x):
+            return
+        self.levels[0].extend(x, np.asarray(y, dtype=np.float64))
+        k = 0
+        while self._reduce(k):
+            k += 1
+
+    def _reduce(self, k):
+        level = self.levels[k]
+        # A bucket is reduced once the bucket after it is complete too (its mean is the right anchor)
+        ready = (level.n - level.reduced) // BLOCK - 1
+        if ready <= 0:
+            return False
+        start = level.reduced - BLOCK if level.reduced else level.reduced
+        stop = level.reduced + (ready + 1) * BLOCK
+        x = level.x[start:stop].reshape(-1, BLOCK)
+        y = level.y[start:stop].reshape(-1, BLOCK)
+        with np.errstate(invalid="ignore"):
+            means = np.column_stack([x.mean(axis=1), _nanmean_rows(y)])
+        if level.reduced:
+            left, buckets, right = means[:-2], slice(1, -1), means[2:]
+        else:
+            # The very first bucket is anchored on its own first point
+            left = np.vstack([[x[0, 0], y[0, 0]], means[:-2]])
+            buckets, right = slice(0, -1), means[1:]
+        px, py = lttb_buckets(x[buckets], y[buckets], left, right)
+        if len(self.levels) == k + 1:
+            self.levels.append(_Level())
+        self.levels[k + 1].extend(px, py)
+        level.reduced += ready * BLOCK
+        return True
+
+    def visible(self, x0, x1, max_points):
+        """(x, y) arrays covering [x0, x1] with at most about max_points points.
+
+        Uses the finest level that fits, padded with one point either side so
+        lines run off the edges, plus the newest points of finer levels that
+        have not been folded into it yet.
+        """
+        for k, level in enumerate(self.levels):
+            xs = level.x[:level.n]
+            lo = max(int(np.searchsorted(xs, x0, side="left")) - 1, 0)
+            hi = min(int(np.searchsorted(xs, x1, side="right")) + 1, level.n)
+            if hi - lo <= max_points or k == len(self.levels) - 1:
+                break
+        parts_x = [level.x[lo:hi]]
+        parts_y = [level.y[lo:hi]]
+        last = level.x[hi - 1] if hi > lo else x0
+        if hi == level.n:
+            for finer in reversed(self.levels[:k]):
+                tail = finer.x[:finer.n]
+                start = int(np.searchsorted(tail, last, side="right"))
+                end = min(int(np.searchsorted(tail, x1, side="right")) + 1, finer.n)
+                if end > start:
+                    parts_x.append(finer.x[start:end])
+                    parts_y.append(finer.y[start:end])
+                    last = finer.x[end - 1]
+        if len(parts_x) == 1:
+            return parts_x[0], parts_y[0]
+        return np.concatenate(parts_x), np.concatenate(parts_y)
+
+
+def _nanmean_rows(values):
+    valid = ~np.isnan(values)
+    counts = valid.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(valid, values, 0.0).sum(axis=1) / counts
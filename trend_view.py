@@ -0,0 +1,367 @@
+import time
+from datetime import datetime
+import numpy as np
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QCheckBox, QScrollArea, QLabel
+from PyQt5.QtCore import Qt, QTimer, QPointF, QRectF, QLineF
+from PyQt5.QtGui import QPainter, QPen, QColor, QPolygonF, QTransform
+from trend import TrendPyramid
+
+# Zoom presets (label, seconds on screen)
+SPANS = [("Minute", 60), ("Hour", 3600), ("Day", 86400), ("Week", 7 * 86400)]
+MIN_SPAN = 10
+MAX_SPAN = 31 * 86400
+FRAME_MS = 33  # ~30 fps
+
+# History loaded when a device is opened: raw readings for the last day, minute averages before that
+HISTORY_SPAN = 7 * 86400
+RAW_SPAN = 86400
+
+# Tick spacings tried for the time axis, in seconds
+TIME_STEPS = [1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 21600, 43200, 86400,
+              2 * 86400, 7 * 86400]
+
+MARGIN_LEFT, MARGIN_RIGHT, MARGIN_TOP, MARGIN_BOTTOM = 56, 10, 20, 20
+_LINE_PEN = QPen(QColor("#1f77b4"))
+_LINE_PEN.setCosmetic(True)
+_LIMIT_PEN = QPen(QColor("#2ca02c"), 1, Qt.DashLine)
+_BAND_COLOR = QColor(44, 160, 44, 40)
+_GRID_PEN = QPen(QColor("#e0e0e0"))
+
+
+def _polygon(x, y):
+    """QPolygonF for numpy x/y, filled through the polygon's buffer instead of point by point."""
+    polygon = QPolygonF(len(x))
+    if len(x):
+        pointer = polygon.data()
+        pointer.setsize(len(x) * 16)
+        points = np.frombuffer(pointer, dtype=np.float64)
+        points[0::2] = x
+        points[1::2] = y
+    return polygon
+
+
+def _segments(x, y):
+    """Split a series at missing (NaN) values so gaps are drawn as gaps."""
+    valid = np.r_[False, ~np.isnan(y), False]
+    edges = np.flatnonzero(valid[1:] != valid[:-1])
+    return [(x[start:stop], y[start:stop]) for start, stop in zip(edges[0::2], edges[1::2])]
+
+
+class TrendViewState:
+    """Time range shared by every plot in a window, so zooming or panning one moves them all."""
+
+    def __init__(self, span=3600):
+        self.span = span
+        self.x1 = time.time()
+        self.follow = True
+        self.plots = []
+
+    @property
+    def x0(self):
+        return self.x1 - self.span
+
+    def set_range(self, x0, x1):
+        span = min(max(x1 - x0, MIN_SPAN), MAX_SPAN)
+        self.x1 = (x0 + x1 + span) / 2 if x1 - x0 < span else x1
+        self.span = span
+        self.changed()
+
+    def changed(self):
+        for plot in self.plots:
+            plot.update()
+
+
+class TrendPlot(QWidget):
+    """One channel of one device drawn with QPainter.
+
+    The visible slice of the series comes from the TrendPyramid level that
+    fits the pixel width. It is kept as polygons in data coordinates over a
+    range wider than the screen, so following live data or panning a little
+    only changes the transform; new readings are appended to the last
+    polygon instead of rebuilding it.
+    """
+
+    def __init__(self, view, title, unit, low=None, high=None, parent=None):
+        super().__init__(parent)
+        self.view = view
+        self.title = title
+        self.unit = unit
+        self.low = low
+        self.high = high
+        self.series = TrendPyramid()
+        self.dirty = False
+        self._cache = None
+        self._drag_x = None
+        self.setMinimumHeight(160)
+        self.setMouseTracking(False)
+
+    def extend(self, x, y):
+        """Append readings newer than the last one held."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        last = self.series.last_x
+        if last is not None:
+            keep = x > last
+            x, y = x[keep], y[keep]
+        if len(x):
+            self.series.extend(x, y)
+            self.dirty = True
+
+    def plot_rect(self):
+        return QRectF(MARGIN_LEFT, MARGIN_TOP, max(self.width() - MARGIN_LEFT - MARGIN_RIGHT, 1),
+                      max(self.height() - MARGIN_TOP - MARGIN_BOTTOM, 1))
+
+    def _build_cache(self, x0, x1, width):
+        # Cover half a screen either side so small pans and live scrolling reuse the polygons
+        span = x1 - x0
+        lo, hi = x0 - span / 2, x1 + span / 2
+        x, y = self.series.visible(lo, hi, int(width) * 4)
+        origin = x0
+        polygons = [_polygon(sx - origin, sy) for sx, sy in _segments(x, y)]
+        with np.errstate(invalid="ignore"):
+            ys = y[(x >= x0) & (x <= x1)]
+        ys = ys[~np.isnan(ys)]
+        self._cache = {
+            "lo": lo, "hi": hi, "span": span, "width": width, "origin": origin, "polygons": polygons,
+            "last_x": x[-1] if len(x) else None, "open": bool(len(y)) and not np.isnan(y[-1]),
+            "tail": 0, "ymin": ys.min() if len(ys) else None, "ymax": ys.max() if len(ys) else None,
+        }
+
+    def _append_cache(self):
+        # New readings go on the end of the last polygon (level 0 points, so they stay exact)
+        cache = self._cache
+        level = self.series.levels[0]
+        xs = level.x[:level.n]
+        start = 0 if cache["last_x"] is None else int(np.searchsorted(xs, cache["last_x"], side="right"))
+        if start >= level.n:
+            return True
+        if level.n - start > cache["width"] or xs[level.n - 1] > cache["hi"]:
+            return False  # Too much to append point by point or past the cached range; rebuild
+        origin = cache["origin"]
+        for x, y in zip(xs[start:level.n].tolist(), level.y[start:level.n].tolist()):
+            if y != y:
+                cache["open"] = False
+                continue
+            if not cache["open"]:
+                cache["polygons"].append(QPolygonF())
+                cache["open"] = True
+            cache["polygons"][-1].append(QPointF(x - origin, y))
+            cache["ymin"] = y if cache["ymin"] is None else min(cache["ymin"], y)
+            cache["ymax"] = y if cache["ymax"] is None else max(cache["ymax"], y)
+        cache["last_x"] = xs[level.n - 1]
+        cache["tail"] += level.n - start
+        return True
+
+    def _y_range(self):
+        values = [v for v in (self._cache["ymin"], self._cache["ymax"], self.low, self.high) if v is not None]
+        if not values:
+            return 0.0, 1.0
+        ymin, ymax = min(values), max(values)
+        pad = max((ymax - ymin) * 0.1, 0.5)
+        return ymin - pad, ymax + pad
+
+    def paintEvent(self, event):
+        rect = self.plot_rect()
+        x0, x1 = self.view.x0, self.view.x1
+        cache = self._cache
+        if (cache is None or x0 < cache["lo"] or x1 > cache["hi"] or cache["width"] != rect.width()
+                or abs(cache["span"] - (x1 - x0)) > 1e-6 * cache["span"] or cache["tail"] > rect.width()
+                or (self.dirty and not self._append_cache())):
+            self._build_cache(x0, x1, rect.width())
+        self.dirty = False
+        ymin, ymax = self._y_range()
+
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        painter.drawText(QRectF(MARGIN_LEFT, 0, rect.width(), MARGIN_TOP), Qt.AlignLeft | Qt.AlignVCenter,
+                         f"{self.title} ({self.unit})")
+
+        def y_pixel(value):
+            return rect.bottom() - (value - ymin) / (ymax - ymin) * rect.height()
+
+        # Limit band: shaded between min and max (to the plot edge if one is not set), dashed at each limit
+        if self.low is not None or self.high is not None:
+            top = rect.top() if self.high is None else max(y_pixel(self.high), rect.top())
+            bottom = rect.bottom() if self.low is None else min(y_pixel(self.low), rect.bottom())
+            painter.fillRect(QRectF(rect.left(), top, rect.width(), bottom - top), _BAND_COLOR)
+            painter.setPen(_LIMIT_PEN)
+            for limit in (self.low, self.high):
+                if limit is not None:
+                    painter.drawLine(QPointF(rect.left(), y_pixel(limit)), QPointF(rect.right(), y_pixel(limit)))
+
+        self._draw_axes(painter, rect, x0, x1, ymin, ymax, y_pixel)
+
+        # Series: polygons are in (seconds since origin, value); map them with one transform
+        sx = rect.width() / (x1 - x0)
+        sy = -rect.height() / (ymax - ymin)
+        painter.setClipRect(rect)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setTransform(QTransform(sx, 0, 0, sy, rect.left() - (x0 - self._cache["origin"]) * sx,
+                                        rect.bottom() - ymin * sy))
+        painter.setPen(_LINE_PEN)
+        for polygon in self._cache["polygons"]:
+            if polygon.size() == 1:
+                painter.drawPoint(polygon.at(0))
+            else:
+                painter.drawPolyline(polygon)
+        painter.end()
+
+    def _draw_axes(self, painter, rect, x0, x1, ymin, ymax, y_pixel):
+        painter.setPen(_GRID_PEN)
+        painter.drawRect(rect)
+        metrics = painter.fontMetrics()
+
+        # Value labels at five evenly spaced heights, time labels on local-time multiples of a step
+        # giving roughly one label per 120 px; grid lines go out in one call
+        values = [ymin + (ymax - ymin) * i / 4 for i in range(5)]
+        span = x1 - x0
+        step = next((s for s in TIME_STEPS if span / s <= rect.width() / 120), TIME_STEPS[-1])
+        offset = datetime.now().astimezone().utcoffset().total_seconds()
+        ticks = np.arange(x0 - (x0 + offset) % step + step, x1, step)
+        tick_x = rect.left() + (ticks - x0) / span * rect.width()
+        painter.drawLines([QLineF(rect.left(), y_pixel(v), rect.right(), y_pixel(v)) for v in values] +
+                          [QLineF(x, rect.top(), x, rect.bottom()) for x in tick_x.tolist()])
+
+        painter.setPen(Qt.black)
+        for value in values:
+            y = y_pixel(value)
+            painter.drawText(QRectF(0, y - metrics.height() / 2, MARGIN_LEFT - 4, metrics.height()),
+                             Qt.AlignRight | Qt.AlignVCenter, f"{value:.1f}")
+        fmt = "%H:%M:%S" if step < 60 else "%H:%M" if span <= 86400 else "%m-%d %H:%M"
+        for tick, x in zip(ticks.tolist(), tick_x.tolist()):
+            painter.drawText(QRectF(x - 60, rect.bottom() + 2, 120, MARGIN_BOTTOM - 2), Qt.AlignCenter,
+                             datetime.fromtimestamp(tick).strftime(fmt))
+
+    def wheelEvent(self, event):
+        # Zoom around the time under the cursor (around "now" while following)
+        factor = 0.8 if event.angleDelta().y() > 0 else 1.25
+        view = self.view
+        if view.follow:
+            view.set_range(view.x1 - view.span * factor, view.x1)
+            return
+        rect = self.plot_rect()
+        anchor = view.x0 + (event.pos().x() - rect.left()) / rect.width() * view.span
+        view.set_range(anchor - (anchor - view.x0) * factor, anchor + (view.x1 - anchor) * factor)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self._drag_x = event.pos().x()
+
+    def mouseMoveEvent(self, event):
+        if self._drag_x is None:
+            return
+        view = self.view
+        shift = (event.pos().x() - self._drag_x) / self.plot_rect().width() * view.span
+        self._drag_x = event.pos().x()
+        view.follow = False
+        view.set_range(view.x0 - shift, view.x1 - shift)
+
+    def mouseReleaseEvent(self, event):
+        self._drag_x = None
+
+
+class TrendWindow(QWidget):
+    """Live temperature and humidity trends for the chosen devices.
+
+    Wheel zooms, dragging pans, the buttons jump to a preset span; "Follow"
+    keeps the newest reading at the right edge.
+    """
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle("Trends")
+        self.resize(1000, 700)
+        self.history = history
+        self.view = TrendViewState()
+        self.plots = {}  # device id -> (temperature plot, humidity plot)
+
+        buttons = QHBoxLayout()
+        for label, span in SPANS:
+            button = QPushButton(label)
+            button.clicked.connect(lambda _, span=span: self.show_span(span))
+            buttons.addWidget(button)
+        self.follow_box = QCheckBox("Follow")
+        self.follow_box.setChecked(True)
+        self.follow_box.toggled.connect(self.set_follow)
+        buttons.addWidget(self.follow_box)
+        buttons.addStretch()
+
+        self.plot_layout = QVBoxLayout()
+        container = QWidget()
+        container.setLayout(self.plot_layout)
+        scroll = QScrollArea()
+        scroll.setWidgetResizable(True)
+        scroll.setWidget(container)
+
+        layout = QVBoxLayout()
+        layout.addLayout(buttons)
+        layout.addWidget(scroll)
+        self.setLayout(layout)
+
+        # Repaint only plots with new data, at most once per frame
+        self.frame_timer = QTimer(self)
+        self.frame_timer.timeout.connect(self.next_frame)
+        self.frame_timer.start(FRAME_MS)
+
+    def show_span(self, span):
+        self.view.span = span
+        self.view.follow = True
+        self.follow_box.setChecked(True)
+        self.view.x1 = time.time()
+        self.view.changed()
+
+    def set_follow(self, follow):
+        self.view.follow = follow
+        if follow:
+            self.view.x1 = time.time()
+            self.view.changed()
+
+    def add_device(self, ip_data):
+        """Add plots for one device, seeded from the history store."""
+        device_id = ip_data['id']
+        if device_id in self.plots:
+            return
+        title = ip_data.get('title') or ip_data['ip']
+        temperature = TrendPlot(self.view, f"{title} temperature", "°C",
+                                ip_data.get('min_temp'), ip_data.get('max_temp'))
+        humidity = TrendPlot(self.view, f"{title} humidity", "%",
+                             ip_data.get('min_humidity'), ip_data.get('max_humidity'))
+
+        now = time.time()
+        records = [self.history.query(device_id, now - HISTORY_SPAN, now - RAW_SPAN, "minute"),
+                   self.history.query(device_id, now - RAW_SPAN, None, "raw")]
+        if len(records[1]):
+            # Minute averages only up to where the raw readings start
+            records[0] = records[0][records[0]["ts"] < records[1]["ts"][0]]
+        for part in records:
+            temperature.extend(part["ts"], part["temperature"])
+            humidity.extend(part["ts"], part["humidity"])
+
+        location = ip_data.get('location')
+        self.plot_layout.addWidget(QLabel(f"<b>{title}</b>" + (f" — {location}" if location else "")))
+        for plot in (temperature, humidity):
+            self.plot_layout.addWidget(plot)
+            self.view.plots.append(plot)
+        self.plots[device_id] = (temperature, humidity)
+
+    def add_readings(self, readings):
+        """Append (device id, temperature, humidity, ts) readings; None values become gaps."""
+        for device_id, temperature, humidity, ts in readings:
+            plots = self.plots.get(device_id)
+            if plots is None:
+                continue
+            plots[0].extend([ts], [np.nan if temperature is None else temperature])
+            plots[1].extend([ts], [np.nan if humidity is None else humidity])
+
+    def next_frame(self):
+        view = self.view
+        if view.follow and view.plots:
+            # Scroll only once "now" has moved at least a pixel; a week on screen moves every few minutes
+            now = time.time()
+            if (now - view.x1) * view.plots[0].plot_rect().width() >= view.span:
+                view.x1 = now
+                view.changed()
+                return
+        for plot in view.plots:
+            if plot.dirty:
+                plot.update()